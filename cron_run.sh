@@ -46,8 +46,12 @@ run() {
 push_data_repo() {
   cd "${DATA_REPO}"
   git add --all .
-  git commit -m "Update CSV files."
-  git push origin master:master
+  # Only export files whose data changed are rewritten, so some days there's
+  # nothing to commit.
+  if ! git diff --cached --quiet; then
+    git commit -m "Update CSV files."
+    git push origin master:master
+  fi
   cd -
 }
 
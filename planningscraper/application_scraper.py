@@ -1,17 +1,44 @@
+import codecs
+import copy
 import datetime
+import functools
+import time
 from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
 
 import requests
 import requests_cache
 
 import re
 
-from lxml.html import fromstring
+from lxml import etree
+from lxml.html import fromstring, Element, HTMLParser, HtmlElementClassLookup
 import pytz
 from bng_to_latlon import OSGB36toWGS84
 
 
 UK = pytz.timezone('Europe/London')
+
+# The labels of every field read by the parse_* functions below.
+FIELD_NAMES = frozenset([
+    'Agent',
+    'Applicant',
+    'Application Number',
+    'Application Type',
+    'Case Officer / Tel',
+    'Comments Until',
+    'Current Status',
+    'Date of Committee',
+    'Decision',
+    'Determination Level',
+    'Development Type',
+    'Location Co ordinates',
+    'Parishes',
+    'Planning Officer',
+    'Proposal',
+    'Site Address',
+    'Wards',
+])
 Geo = namedtuple('Geo', 'easting,northing,latitude,longitude')
 
 
@@ -33,49 +60,290 @@ class Geo():
         )
 
 
-def scrape_single_application(url):
-    with requests_cache.enabled('cache.db', expire_after=3*3600):
-        response = requests.get(url)
-    response.raise_for_status()
+class Application(Mapping):
+    """
+    A single parsed application page. Every field may be None.
+
+    Dates (`comments_until_date`, `committee_date`, `decision_date`) are
+    `datetime.date`, `extract_datetime` is an aware `datetime.datetime`,
+    `geo_easting`/`geo_northing` are ints, `geo_latitude`/`geo_longitude`
+    are floats and everything else is a str.
+
+    Behaves as a read-only mapping of field name to value, so it can be
+    passed straight to `dict()`, `json.dump` helpers and the like.
+    """
+
+    __slots__ = (
+        'extract_datetime',
+        'application_number_provisional',
+        'application_number',
+        'comments_until_date',
+        'committee_date',
+        'decision',
+        'decision_date',
+        'site_address',
+        'postcode',
+        'application_type',
+        'development_type',
+        'description',
+        'current_status',
+        'applicant',
+        'agent',
+        'wards',
+        'geo_northing',
+        'geo_easting',
+        'geo_latitude',
+        'geo_longitude',
+        'parishes',
+        'case_officer_name',
+        'case_officer_number',
+        'planning_officer_name',
+        'determination_level',
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+
+        if fields:
+            raise TypeError('Unknown field(s): {}'.format(', '.join(fields)))
+
+    def __getitem__(self, name):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return 'Application(application_number={!r}, ...)'.format(
+            self.application_number or self.application_number_provisional
+        )
+
+    def to_row(self, **extra):
+        """
+        Return a database row: the fields plus any `extra` columns (such as
+        `northgate_id`).
+        """
+        row = {name: getattr(self, name) for name in self.__slots__}
+        row.update(extra)
+        return row
+
+    def as_dict(self):
+        return OrderedDict(
+            (name, getattr(self, name)) for name in self.__slots__
+        )
+
 
-    return parse_application_page(response.content)
+# Part of every parse cache key: bump it whenever a change to the parse_*
+# functions (or `Application`) would parse a page differently, so results
+# saved by the old parser aren't reused.
+PARSER_VERSION = '1'
 
 
-def parse_application_page(page_bytes):
-    unicode_html = page_bytes.decode('utf-8')
-    root = fromstring(unicode_html)
+def scrape_single_application(url, breaker=None, parse_cache=None,
+                              cache_name='cache.db'):
+    """
+    Fetch and parse a single application page. If a `breaker` (see
+    `circuit_breaker.CircuitBreaker`) is given, requests are gated and
+    throttled, and the outcome of those that reached the server recorded. If a
+    `parse_cache` (see `parse_cache.ParseCache`) is given, a page we've
+    parsed before isn't parsed again. Responses are cached for three hours
+    in the SQLite file `cache_name`, which no other process should be using.
+    """
+    with requests_cache.enabled(cache_name, expire_after=3*3600):
+        # Always gated: the cache only knows whether its copy has expired
+        # once it's asked for it.
+        if breaker is not None:
+            breaker.before_request()
+            time.sleep(breaker.throttle_delay())
+
+        started = time.time()
+        try:
+            response = requests.get(url)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if breaker is not None:
+                _record_outcome(breaker, e.response, time.time() - started,
+                                server_error=is_server_error(e))
+            raise
+
+    if breaker is not None:
+        _record_outcome(breaker, response, time.time() - started)
+
+    encoding = declared_encoding(response)
+
+    if parse_cache is None:
+        return parse_application_page(response.content, encoding)
+
+    return with_extract_datetime(parse_cache.get_or_parse(
+        response.content,
+        functools.partial(parse_application_fields, encoding=encoding),
+        '{}-{}'.format(PARSER_VERSION, encoding)
+    ))
+
+
+def _record_outcome(breaker, response, latency, server_error=False):
+    if getattr(response, 'from_cache', False):
+        breaker.record_cached()  # the server wasn't asked
+    elif server_error:
+        breaker.record_failure()
+    else:
+        breaker.record_success(latency)
+
+
+def declared_encoding(response):
+    """
+    The charset from the response's Content-Type header, if it gave a known
+    one. (The pages' own <meta> charset is garbage.)
+    """
+    match = re.search(
+        'charset=["\']?([\\w.:-]+)',
+        response.headers.get('Content-Type', ''),
+        re.IGNORECASE
+    )
+    if match is None:
+        return None
+
+    try:
+        return codecs.lookup(match.group(1)).name
+    except LookupError:
+        return None
+
+
+def is_server_error(exception):
+    """
+    True for failures that suggest the server is struggling (connection
+    problems, timeouts, 5xx) rather than a problem with this one request.
+    """
+    response = getattr(exception, 'response', None)
+    if response is None:
+        return True
+    return response.status_code >= 500
+
+
+def parse_application_page(page_bytes, encoding=None):
+    return with_extract_datetime(
+        parse_application_fields(page_bytes, encoding)
+    )
 
+
+def with_extract_datetime(application):
+    application.extract_datetime = datetime.datetime.now(UK)
+    return application
+
+
+def parse_application_fields(page_bytes, encoding=None):
+    """
+    Return an Application with everything we extract from the page, which
+    (unlike `extract_datetime`) depends only on the page content.
+
+    The bytes go straight to lxml, decoded as `encoding` (default UTF-8).
+    """
+    root = fromstring(page_bytes, parser=_html_parser(encoding or 'utf-8'))
+    return application_from_root(root)
+
+
+def iterparse_application_fields(fileobj, encoding=None, chunk_size=16384):
+    """
+    As `parse_application_fields`, but reads the page from a binary file
+    object a chunk at a time, copying out the field <div>s we need and
+    throwing the rest of the tree away as it goes, so memory stays bounded
+    however large the page. Used for bulk reparsing (see `reparse`).
+    """
+    parser = etree.HTMLPullParser(
+        events=('end',), tag='div', encoding=encoding or 'utf-8'
+    )
+    parser.set_element_class_lookup(HtmlElementClassLookup())
+
+    fields_root = Element('div')
+    found = set()
+
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        parser.feed(chunk)
+        _capture_field_divs(parser.read_events(), fields_root, found)
+
+        if found == FIELD_NAMES:
+            break
+    else:
+        parser.close()
+        _capture_field_divs(parser.read_events(), fields_root, found)
+
+    return application_from_root(fields_root)
+
+
+def _capture_field_divs(events, fields_root, found):
+    for _, div in events:
+        name = _field_name(div)
+        if name is not None and name not in found:
+            found.add(name)
+            fields_root.append(copy.deepcopy(div))
+
+        if any(_field_name(ancestor) for ancestor in div.iterancestors('div')):
+            continue  # still needed for the enclosing field's text
+
+        div.clear()
+        while div.getprevious() is not None:
+            del div.getparent()[0]
+
+
+def _field_name(div):
+    for span in div.iterchildren('span'):
+        if span.text in FIELD_NAMES:
+            return span.text
+    return None
+
+
+_HTML_PARSERS = {}
+
+
+def _html_parser(encoding):
+    if encoding not in _HTML_PARSERS:
+        _HTML_PARSERS[encoding] = HTMLParser(encoding=encoding)
+    return _HTML_PARSERS[encoding]
+
+
+def application_from_root(root):
     geo = parse_geo(root)
 
-    return OrderedDict([
-       ('extract_datetime', datetime.datetime.now(UK)),
-       ('application_number_provisional', parse_application_number_provisional(
-           root)
-        ),
-       ('application_number', parse_application_number(root)),
-       ('comments_until_date', parse_comments_until(root)),
-       ('committee_date', parse_date_of_committee(root)),
-       ('decision', parse_decision(root)),
-       ('decision_date', parse_decision_date(root)),
-       ('site_address', parse_site_address(root)),
-       ('postcode', parse_postcode(root)),
-       ('application_type', parse_application_type(root)),
-       ('development_type', parse_development_type(root)),
-       ('description', parse_description(root)),
-       ('current_status', parse_current_status(root)),
-       ('applicant', parse_applicant(root)),
-       ('agent', parse_agent(root)),
-       ('wards', parse_wards(root)),
-       ('geo_northing', geo.northing),
-       ('geo_easting', geo.easting),
-       ('geo_latitude', geo.latitude),
-       ('geo_longitude', geo.longitude),
-       ('parishes', parse_parishes(root)),
-       ('case_officer_name', parse_case_officer_name(root)),
-       ('case_officer_number', parse_case_officer_number(root)),
-       ('planning_officer_name', parse_planning_officer_name(root)),
-       ('determination_level', parse_determination_level(root)),
-    ])
+    return Application(
+        application_number_provisional=parse_application_number_provisional(
+            root),
+        application_number=parse_application_number(root),
+        comments_until_date=parse_comments_until(root),
+        committee_date=parse_date_of_committee(root),
+        decision=parse_decision(root),
+        decision_date=parse_decision_date(root),
+        site_address=parse_site_address(root),
+        postcode=parse_postcode(root),
+        application_type=parse_application_type(root),
+        development_type=parse_development_type(root),
+        description=parse_description(root),
+        current_status=parse_current_status(root),
+        applicant=parse_applicant(root),
+        agent=parse_agent(root),
+        wards=parse_wards(root),
+        geo_northing=geo.northing,
+        geo_easting=geo.easting,
+        geo_latitude=geo.latitude,
+        geo_longitude=geo.longitude,
+        parishes=parse_parishes(root),
+        case_officer_name=parse_case_officer_name(root),
+        case_officer_number=parse_case_officer_number(root),
+        planning_officer_name=parse_planning_officer_name(root),
+        determination_level=parse_determination_level(root),
+    )
 
 
 def parse_application_number_provisional(lxml_root):
@@ -264,12 +532,23 @@ def parse_postcode(lxml_root):
 
     possible_postcode = address_lines[-1]
 
-    match = re.match('([Ll]\d{1,2}) ?(\d[A-Za-z]{2})', possible_postcode)
+    postcode = normalise_postcode(possible_postcode)
+
+    if postcode is None:
+        print("NOT A POSTCODE? {}".format(possible_postcode))
+
+    return postcode
+
+
+def normalise_postcode(text):
+    """
+    'l15 3jl' -> 'L15 3JL', 'L153JL' -> 'L15 3JL', 'Smithdown Road' -> None
+    """
+    match = re.match('([Ll]\d{1,2}) ?(\d[A-Za-z]{2})', text)
 
     if match is not None:
         return ' '.join(match.groups()).upper()
     else:
-        print("NOT A POSTCODE? {}".format(possible_postcode))
         return None
 
 
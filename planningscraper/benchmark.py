@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+"""
+Run discovery, refresh and export end-to-end against a local stub Northgate
+server (see `stub_server`) and report throughput and peak memory.
+
+    python -m planningscraper.benchmark --applications 2000 --latency 0.05
+    python -m planningscraper.benchmark --error-rate 0.02 --browser
+
+Everything (database, HTTP cache, parse cache, exported files) goes into a
+scratch directory, so the real db.sqlite is never touched. Without
+--browser, discovery reads the stub's search results pages directly
+rather than driving Firefox through the search form.
+"""
+
+import argparse
+import io
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from os.path import join as pjoin
+from urllib.parse import urljoin, urlencode
+
+import dataset
+import requests
+from lxml.html import fromstring
+
+from . import main as scraper
+from . import stub_server
+from .db import applications_table, use_database
+from .output import output_data
+from .recent_applications_scraper import RecentApplicationsScraper
+
+LOG = logging.getLogger(__name__)
+
+
+def run(applications, days, latency, error_rate, browser, keep):
+    scratch = tempfile.mkdtemp(prefix='planningscraper-benchmark-')
+    original_directory = os.getcwd()
+    LOG.info('Working in {}'.format(scratch))
+    use_database(dataset.connect('sqlite:///{}'.format(
+        pjoin(scratch, 'db.sqlite'))))
+    os.chdir(scratch)  # requests_cache and the parse cache write here
+
+    table = applications_table()
+
+    scraper.configure_logging()
+    scraper.PAUSE_BEFORE_REFRESH = 0
+    scraper.FETCH_BUDGET = None
+
+    server, search_url = stub_server.start_in_process(
+        applications, days, latency, error_rate)
+
+    results = []
+    try:
+        with _phase(results, 'discovery', lambda: table.count()):
+            if browser:
+                scraper.find_recent_applications(search_url)
+            else:
+                discover_without_browser(search_url, table)
+
+        def count_scraped():
+            return table.count() - table.count(extract_datetime=None)
+
+        with _phase(results, 'refresh', count_scraped):
+            scraper.get_or_refresh_data_for_applications()
+
+        export_dir = pjoin(scratch, 'export')
+        os.makedirs(pjoin(export_dir, 'applications'))
+        with _phase(results, 'export', lambda: table.count()):
+            output_data(export_dir)
+
+    finally:
+        server.terminate()
+        os.chdir(original_directory)
+        if not keep:
+            shutil.rmtree(scratch)
+
+    return results
+
+
+def discover_without_browser(search_url, table):
+    """
+    Page through the stub's search results for each day searched by
+    `RecentApplicationsScraper`, saving application ids and URLs as
+    `find_recent_applications` would.
+    """
+    results_url = urljoin(search_url, stub_server.RESULTS_PATH)
+    number_links = RecentApplicationsScraper.APPLICATION_NUMBER_A[1]
+    next_page_links = RecentApplicationsScraper.NEXT_PAGE_A[1]
+
+    for date in RecentApplicationsScraper._last_30_days():
+        url = '{}?{}'.format(results_url, urlencode({
+            'dateStart': date.isoformat(),
+            'dateEnd': date.isoformat(),
+        }))
+
+        while url is not None:
+            root = fromstring(_get_with_retries(url))
+
+            for a in root.xpath(number_links):
+                application_url = urljoin(url, a.get('href'))
+                northgate_id = RecentApplicationsScraper._parse_northgate_id(
+                    application_url)
+
+                table.upsert({
+                    'northgate_id': northgate_id,
+                    'url': application_url,
+                    'received_date': date,
+                }, ['northgate_id'])
+
+            next_page = root.xpath(next_page_links)
+            url = urljoin(url, next_page[0].get('href')) if next_page else None
+
+
+def _get_with_retries(url, attempts=5):
+    for attempt in range(1, attempts + 1):
+        response = requests.get(url)
+        if response.status_code < 500 or attempt == attempts:
+            response.raise_for_status()
+            return response.content
+        time.sleep(0.1 * attempt)
+
+
+class _phase():
+    """
+    Time a step of the run and record how many applications it handled and
+    the process's peak memory afterwards.
+    """
+
+    def __init__(self, results, name, count_applications):
+        self.results = results
+        self.name = name
+        self.count_applications = count_applications
+
+    def __enter__(self):
+        self.started = time.time()
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is not None:
+            return
+
+        elapsed = time.time() - self.started
+        count = self.count_applications()
+
+        self.results.append({
+            'phase': self.name,
+            'applications': count,
+            'seconds': elapsed,
+            'applications_per_second': count / elapsed if elapsed else 0,
+            'peak_memory_mb': _peak_memory_mb(),
+        })
+
+
+def _peak_memory_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak / 1024.0
+
+
+def format_results(results):
+    out = io.StringIO()
+    out.write('{:<10} {:>12} {:>10} {:>10} {:>14}\n'.format(
+        'phase', 'applications', 'seconds', 'apps/sec', 'peak RSS (MB)'))
+    for result in results:
+        out.write(
+            '{phase:<10} {applications:>12} {seconds:>10.1f} '
+            '{applications_per_second:>10.1f} '
+            '{peak_memory_mb:>14.1f}\n'.format(**result))
+    return out.getvalue()
+
+
+def main(argv):
+    args = _parse_args(argv)
+
+    results = run(
+        applications=args.applications,
+        days=args.days,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        browser=args.browser,
+        keep=args.keep,
+    )
+
+    sys.stdout.write(format_results(results))
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Benchmark a whole scraper run against a stub server.')
+    parser.add_argument('--applications', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=29,
+                        help='spread applications over this many days '
+                             '(discovery searches at most 29)')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='mean seconds the stub waits before responding')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of stub responses that are 503s')
+    parser.add_argument('--browser', action='store_true',
+                        help='discover applications with Firefox/Selenium, '
+                             'as in production')
+    parser.add_argument('--keep', action='store_true',
+                        help="don't delete the scratch directory")
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
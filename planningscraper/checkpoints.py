@@ -0,0 +1,137 @@
+"""
+Durable progress markers so that a crashed run can pick up where it died
+rather than starting again from scratch.
+
+Checkpoints are keyed by the date of the run, so a cron run tomorrow starts
+afresh while a restart later today resumes.
+"""
+
+import datetime
+
+import sqlalchemy
+
+from .db import database
+
+
+class RefreshQueue():
+    """
+    The ordered list of applications a run intends to (re)scrape, with each
+    one ticked off as soon as its data has been saved.
+    """
+
+    def __init__(self, run_date=None):
+        self.run_date = (run_date or datetime.date.today()).isoformat()
+        self.table = _load_table('checkpoint_refresh_queue', [
+            ('run_date', sqlalchemy.String),
+            ('position', sqlalchemy.Integer),
+            ('northgate_id', sqlalchemy.Integer),
+            ('url', sqlalchemy.String),
+            ('done', sqlalchemy.Boolean),
+        ])
+
+    def save(self, rows):
+        """
+        Store the work queue for this run, replacing any previous one.
+        """
+        _delete_other_runs(self.table, self.run_date)
+        self.table.delete(run_date=self.run_date)
+
+        self.table.insert_many([
+            {
+                'run_date': self.run_date,
+                'position': position,
+                'northgate_id': row['northgate_id'],
+                'url': row['url'],
+                'done': False,
+            } for position, row in enumerate(rows)
+        ])
+
+    def remaining(self):
+        """
+        Return the rows not yet scraped in this run, in their original order.
+        """
+        return [
+            {'northgate_id': row['northgate_id'], 'url': row['url']}
+            for row in self.table.find(
+                run_date=self.run_date, done=False, order_by='position'
+            )
+        ]
+
+    def mark_done(self, northgate_id):
+        self.table.update(
+            {
+                'run_date': self.run_date,
+                'northgate_id': northgate_id,
+                'done': True
+            },
+            ['run_date', 'northgate_id']
+        )
+
+
+class DiscoveryCheckpoint():
+    """
+    Per received-date cursor for the search results: which dates have been
+    fully searched in this run, and for the rest, how many results pages
+    have already been saved.
+    """
+
+    def __init__(self, run_date=None):
+        self.run_date = (run_date or datetime.date.today()).isoformat()
+        self.table = _load_table('checkpoint_discovery', [
+            ('run_date', sqlalchemy.String),
+            ('received_date', sqlalchemy.String),
+            ('pages_done', sqlalchemy.Integer),
+            ('complete', sqlalchemy.Boolean),
+        ])
+        _delete_other_runs(self.table, self.run_date)
+
+    def unfinished(self, received_dates):
+        """
+        True if this run started searching but didn't get through all of
+        `received_dates`, ie. it crashed part way.
+        """
+        if self.table.find_one(run_date=self.run_date) is None:
+            return False
+        return not all(self.is_complete(date) for date in received_dates)
+
+    def is_complete(self, received_date):
+        row = self._find(received_date)
+        return row is not None and bool(row['complete'])
+
+    def pages_done(self, received_date):
+        row = self._find(received_date)
+        return 0 if row is None else (row['pages_done'] or 0)
+
+    def mark_page_done(self, received_date, pages_done):
+        self._save(received_date, pages_done=pages_done, complete=False)
+
+    def mark_complete(self, received_date):
+        self._save(received_date, complete=True)
+
+    def _find(self, received_date):
+        return self.table.find_one(
+            run_date=self.run_date,
+            received_date=received_date.isoformat()
+        )
+
+    def _save(self, received_date, **kwargs):
+        row = {
+            'run_date': self.run_date,
+            'received_date': received_date.isoformat(),
+        }
+        row.update(kwargs)
+        self.table.upsert(row, ['run_date', 'received_date'])
+
+
+def _load_table(name, columns):
+    table = database().get_table(name)
+    for column_name, column_type in columns:
+        if column_name not in table.columns:
+            table.create_column(column_name, column_type)
+    return table
+
+
+def _delete_other_runs(table, run_date):
+    for row in table.distinct('run_date'):
+        if row['run_date'] != run_date:
+            table.delete(run_date=row['run_date'])
@@ -0,0 +1,168 @@
+"""
+Per-host circuit breaker and throttle for the council server.
+
+While the server is healthy requests go through at full speed. If too many
+recent requests fail (the error budget is spent) the circuit opens and
+requests are refused for a cool-down period, after which a single trial
+request is let through (half-open). Slow responses add a delay before the
+next request so a struggling server isn't hammered.
+"""
+
+import logging
+import time
+
+from collections import deque, Counter
+from urllib.parse import urlparse
+
+LOG = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host, retry_after):
+        super(CircuitOpenError, self).__init__(
+            'Circuit for {} is open, retry in {:.0f}s'.format(
+                host, retry_after))
+        self.host = host
+        self.retry_after = retry_after
+
+
+class CircuitBreaker():
+    def __init__(self, host, window=20, error_budget=0.25,
+                 consecutive_failures=5, reset_timeout=60,
+                 target_latency=1.0, max_delay=30, clock=time.time):
+        self.host = host
+        self.window = window
+        self.error_budget = error_budget
+        self.consecutive_failures = consecutive_failures
+        self.reset_timeout = reset_timeout
+        self.target_latency = target_latency
+        self.max_delay = max_delay
+        self.clock = clock
+
+        self.state = CLOSED
+        self.metrics = Counter()
+
+        self._outcomes = deque(maxlen=window)
+        self._failures_in_a_row = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._latency = None  # exponentially weighted moving average
+
+    def before_request(self):
+        """
+        Raise CircuitOpenError if no request should be made to the host right
+        now.
+        """
+        if self.state == OPEN:
+            retry_after = self.retry_after()
+            if retry_after > 0:
+                self.metrics['rejected'] += 1
+                raise CircuitOpenError(self.host, retry_after)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._trial_in_flight:
+                self.metrics['rejected'] += 1
+                raise CircuitOpenError(self.host, self.reset_timeout)
+            self._trial_in_flight = True
+
+    def record_success(self, latency):
+        self.metrics['successes'] += 1
+        self._outcomes.append(True)
+        self._failures_in_a_row = 0
+        self._trial_in_flight = False
+
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency = 0.8 * self._latency + 0.2 * latency
+
+        if self.state == HALF_OPEN:
+            self._outcomes.clear()
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self.metrics['failures'] += 1
+        self._outcomes.append(False)
+        self._failures_in_a_row += 1
+        self._trial_in_flight = False
+
+        if self.state == HALF_OPEN or self._error_budget_spent():
+            self._transition(OPEN)
+
+    def record_cached(self):
+        """
+        The request was answered from a cache: nothing is learnt about the
+        host, but a half-open trial is free to go again.
+        """
+        self.metrics['cached'] += 1
+        self._trial_in_flight = False
+
+    def retry_after(self):
+        """
+        Seconds until an open circuit will let a trial request through.
+        """
+        if self.state != OPEN:
+            return 0
+        return max(0, self._opened_at + self.reset_timeout - self.clock())
+
+    def throttle_delay(self):
+        """
+        Seconds to wait before the next request, growing as the server's
+        response time climbs above `target_latency`.
+        """
+        if self._latency is None or self._latency <= self.target_latency:
+            return 0
+        return min(self.max_delay, 2 * (self._latency - self.target_latency))
+
+    def _error_budget_spent(self):
+        if self._failures_in_a_row >= self.consecutive_failures:
+            return True
+
+        if len(self._outcomes) < self.window:
+            return False
+
+        failures = self._outcomes.count(False)
+        return failures > self.error_budget * len(self._outcomes)
+
+    def _transition(self, new_state):
+        LOG.warning('Circuit for {} {} -> {}'.format(
+            self.host, self.state, new_state))
+
+        self.metrics['to_{}'.format(new_state)] += 1
+        self.state = new_state
+
+        if new_state == OPEN:
+            self._opened_at = self.clock()
+
+
+_BREAKERS = {}
+
+
+def breaker_for(url):
+    """
+    Return the (shared) circuit breaker for the host serving `url`.
+    """
+    host = urlparse(url).netloc
+    if host not in _BREAKERS:
+        _BREAKERS[host] = CircuitBreaker(host)
+    return _BREAKERS[host]
+
+
+def all_metrics():
+    return {
+        host: dict(breaker.metrics, state=breaker.state)
+        for host, breaker in _BREAKERS.items()
+    }
+
+
+def backoff_delay(attempt, base=5, cap=300):
+    """
+    Seconds to wait before retry number `attempt` (1, 2, ...) of a failed
+    request.
+    """
+    return min(cap, base * 2 ** (attempt - 1))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""
+Scrape several councils that run Northgate Planning Explorer, spreading the
+councils across worker processes that all write to the
+`council_applications` table, keyed by (council, northgate_id).
+
+    python -m planningscraper.councils councils.yml --workers 4
+
+See councils.yml.example for the config format. Each council is scraped
+by one worker at a time, with its own request rate limit, so a slow or
+broken council only ties up one worker while the rest carry on.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import sys
+import time
+
+from collections import namedtuple
+
+import dataset
+import requests
+import yaml
+
+from .application_scraper import scrape_single_application
+from .circuit_breaker import CircuitOpenError, breaker_for
+from .db import DATABASE_URL, create_council_tables
+from .main import make_webdriver
+from .recent_applications_scraper import RecentApplicationsScraper
+from .scheduler import prioritise
+from .sql import SQL_IS_DUE
+
+LOG = logging.getLogger(__name__)
+
+TABLE = 'council_applications'
+
+Council = namedtuple(
+    'Council', 'name,search_url,requests_per_second,fetch_budget'
+)
+
+
+def load_councils(filename):
+    with open(filename) as f:
+        config = yaml.safe_load(f)
+
+    return [
+        Council(
+            name=council['name'],
+            search_url=council['search_url'],
+            requests_per_second=float(council.get('requests_per_second', 1)),
+            fetch_budget=council.get('fetch_budget'),
+        ) for council in config['councils']
+    ]
+
+
+class RateLimiter():
+    """
+    Space out calls to `wait()` so they happen at most `per_second` times
+    a second.
+    """
+
+    def __init__(self, per_second, clock=time.time, sleep=time.sleep):
+        self.interval = 1.0 / per_second
+        self.next_allowed = 0
+        self.clock = clock
+        self.sleep = sleep
+
+    def wait(self):
+        now = self.clock()
+        if now < self.next_allowed:
+            self.sleep(self.next_allowed - now)
+        self.next_allowed = max(now, self.next_allowed) + self.interval
+
+
+def run_councils(councils, workers, discover=True):
+    """
+    Scrape all `councils` using `workers` processes. Returns a list of
+    (council name, applications refreshed, error or None).
+    """
+    db = connect()
+    if TABLE not in db.tables:
+        create_council_tables(db)
+
+    # A fresh process per council: no database connections or browsers
+    # shared between them.
+    pool = multiprocessing.Pool(workers, maxtasksperchild=1)
+    try:
+        return list(pool.imap_unordered(
+            _run_council_safely, [(council, discover) for council in councils]
+        ))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _run_council_safely(args):
+    council, discover = args
+    _configure_logging()
+
+    try:
+        return council.name, run_council(council, discover), None
+    except Exception as e:
+        LOG.exception('[{}] failed'.format(council.name))
+        return council.name, 0, repr(e)
+
+
+def run_council(council, discover=True):
+    db = connect()
+    table = db.load_table(TABLE)
+
+    if discover:
+        discover_applications(council, table)
+
+    return refresh_applications(council, db, table)
+
+
+def discover_applications(council, table):
+    LOG.info('[{}] Finding new applications'.format(council.name))
+
+    webdriver = make_webdriver()
+    try:
+        scraper = RecentApplicationsScraper(webdriver, council.search_url)
+        for row in scraper.get_applications():
+            row['council'] = council.name
+            table.upsert(row, ['council', 'northgate_id'])
+    finally:
+        webdriver.quit()
+
+
+def refresh_applications(council, db, table):
+    due = list(db.query(
+        'SELECT * FROM {} WHERE council = :council AND {}'.format(
+            TABLE, SQL_IS_DUE),
+        council=council.name
+    ))
+    to_fetch = prioritise(due, budget=council.fetch_budget)
+
+    LOG.info('[{}] {} applications due, fetching {}'.format(
+        council.name, len(due), len(to_fetch)))
+
+    limiter = RateLimiter(council.requests_per_second)
+    # Workers each get their own response cache: sharing one SQLite file
+    # they'd fail on each other's locks.
+    cache_name = 'cache-{}.db'.format(council.name)
+    refreshed = 0
+
+    for row in to_fetch:
+        url = row['url']
+        limiter.wait()
+
+        try:
+            application = scrape_single_application(
+                url, breaker_for(url), cache_name=cache_name)
+        except CircuitOpenError as e:
+            LOG.error('[{}] {}. Stopping.'.format(council.name, e))
+            break
+        except requests.RequestException as e:
+            LOG.warn('[{}] Failed to fetch {}: {}'.format(
+                council.name, url, e))
+            continue
+
+        table.upsert(
+            application.to_row(
+                council=council.name, northgate_id=row['northgate_id']
+            ),
+            ['council', 'northgate_id']
+        )
+        refreshed += 1
+
+    return refreshed
+
+
+def connect():
+    # Several workers write to the same SQLite file: wait for each other's
+    # locks rather than failing straight away.
+    return dataset.connect(
+        DATABASE_URL, engine_kwargs={'connect_args': {'timeout': 60}}
+    )
+
+
+def _configure_logging():
+    logging.basicConfig(
+        level=logging.INFO, stream=sys.stdout,
+        format='%(processName)s %(levelname)s %(name)s %(message)s'
+    )
+
+
+def main(argv):
+    _configure_logging()
+    args = _parse_args(argv)
+
+    councils = load_councils(args.config)
+    results = run_councils(
+        councils, min(args.workers, len(councils)),
+        discover=not args.skip_discovery
+    )
+
+    failed = False
+    for name, refreshed, error in sorted(results):
+        if error is None:
+            LOG.info('[{}] refreshed {} applications'.format(name, refreshed))
+        else:
+            LOG.error('[{}] failed: {}'.format(name, error))
+            failed = True
+
+    return 1 if failed else 0
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Scrape several Northgate Planning Explorer councils.')
+    parser.add_argument('config', help='YAML file listing the councils')
+    parser.add_argument('--workers', type=int,
+                        default=multiprocessing.cpu_count())
+    parser.add_argument('--skip-discovery', action='store_true',
+                        help="only refresh applications we already know "
+                             "about (doesn't need Firefox)")
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
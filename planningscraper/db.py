@@ -1,15 +1,68 @@
+import os
 from os.path import dirname, join as pjoin
 
 import sqlalchemy
 
 import dataset
 
-db = dataset.connect(
+# Override to point the scraper (and council workers) at a different
+# database file.
+DATABASE_URL = os.environ.get(
+    'PLANNINGSCRAPER_DATABASE_URL',
     'sqlite:///{}'.format(pjoin(dirname(__file__), '..', 'db.sqlite'))
 )
 
+_database = None
 
-if __name__ == '__main__':
+
+def database():
+    """
+    The database everything reads and writes: DATABASE_URL, connected on
+    first use, unless `use_database` has been given another.
+    """
+    if _database is None:
+        use_database(dataset.connect(DATABASE_URL))
+    return _database
+
+
+def use_database(db):
+    """
+    Read and write `db` from now on (for example a scratch
+    `dataset.connect('sqlite://')` in tests), creating the applications
+    table in it if need be.
+    """
+    global _database
+    _database = db
+
+    if 'applications' not in db.tables:
+        create_tables(db)
+    return db
+
+
+def applications_table():
+    return database()['applications']
+
+
+def table_exists(name):
+    """
+    Whether the table (or virtual table, such as an index) exists. Not
+    `db.tables`: that's only read when connecting, so it misses tables
+    created since.
+    """
+    return bool(list(database().query(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name",
+        name=name
+    )))
+
+
+def execute(sql, **params):
+    """
+    Run a statement that returns no rows, with `:name` bind parameters.
+    """
+    database().executable.execute(sqlalchemy.text(sql), **params)
+
+
+def create_tables(db):
     applications = db.create_table(
         'applications',
         primary_id='northgate_id',
@@ -27,5 +80,37 @@ if __name__ == '__main__':
     applications.create_column('decision_date', sqlalchemy.Date)
     applications.create_column('geo_northing', sqlalchemy.Integer)
     applications.create_column('geo_easting', sqlalchemy.Integer)
-else:
-    applications = db.load_table('applications')
+
+    return applications
+
+
+def create_council_tables(db):
+    """
+    Applications from any number of councils (see `councils`), keyed by
+    (council, northgate_id) as Northgate ids are only unique per council.
+    """
+    council_applications = db.create_table('council_applications')
+
+    council_applications.create_column('council', sqlalchemy.String)
+    council_applications.create_column('northgate_id', sqlalchemy.Integer)
+    council_applications.create_column('url', sqlalchemy.String)
+    council_applications.create_column('received_date', sqlalchemy.Date)
+    council_applications.create_column('extract_datetime',
+                                       sqlalchemy.DateTime)
+    council_applications.create_column('comments_until_date',
+                                       sqlalchemy.Date)
+    council_applications.create_column('committee_date', sqlalchemy.Date)
+    council_applications.create_column('decision_date', sqlalchemy.Date)
+    council_applications.create_column('geo_northing', sqlalchemy.Integer)
+    council_applications.create_column('geo_easting', sqlalchemy.Integer)
+    council_applications.create_index(
+        ['council', 'northgate_id'], name='council_applications_key',
+        unique=True
+    )
+
+    return council_applications
+
+
+if __name__ == '__main__':
+    create_tables(database())
+    create_council_tables(database())
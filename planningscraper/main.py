@@ -8,23 +8,47 @@ import datetime
 import io
 import logging
 import sys
+import heapq
 
+from collections import deque
 from os.path import dirname, join as pjoin
 from pprint import pprint
 
+import requests
 from seleniumrequests import Firefox
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 
 from .recent_applications_scraper import RecentApplicationsScraper
-from .application_scraper import scrape_single_application
+from .application_scraper import scrape_single_application, is_server_error
+from .circuit_breaker import (
+    CircuitOpenError, breaker_for, all_metrics, backoff_delay
+)
 from .output import output_data
-from .db import applications, db
-from .sql import SQL_DAYS_SINCE_RECEIVED, SQL_DAYS_SINCE_SCRAPE
+from .parse_cache import ParseCache
+from . import search, spatial
+from .scheduler import prioritise
+from .checkpoints import RefreshQueue, DiscoveryCheckpoint
+from .db import applications_table, database
+from .sql import SQL_IS_DUE
 
 LOG = None
 
 RECENT_CSV = pjoin(dirname(__file__), '..', '_cache', 'recent_urls.csv')
 
+# Maximum number of application pages to fetch in a single run. The most
+# likely-to-have-changed applications are fetched first.
+FETCH_BUDGET = 3000
+
+# Failed fetches are retried later in the run, up to this many attempts.
+MAX_ATTEMPTS = 4
+
+# Give up on the rest of the run once we've spent this long (in seconds)
+# waiting for the council server's circuit to close again.
+MAX_CIRCUIT_WAIT = 20 * 60
+
+# Seconds to pause after logging what's due, before starting to fetch.
+PAUSE_BEFORE_REFRESH = 10
+
 
 def main(argv):
     random.seed(datetime.date.today().isoformat())
@@ -37,7 +61,11 @@ def main(argv):
 def find_new_application_ids():
     LOG.info('Step 1: Find brand new application ids/URLs')
 
-    if recent_applications_needs_updating():
+    if discovery_interrupted():
+        LOG.info('Resuming the search for new applications begun earlier '
+                 'today.')
+        find_recent_applications()
+    elif recent_applications_needs_updating():
         find_recent_applications()
     else:
         LOG.info("We're pretty up to date already.")
@@ -46,22 +74,97 @@ def find_new_application_ids():
 def get_or_refresh_data_for_applications():
     LOG.info('Step 2: (Re)visit known applications & update database')
 
-    for row in get_applications_needing_scraping():
-        url = row.pop('url')
-        northgate_id = row.pop('northgate_id')
+    queue = RefreshQueue()
+
+    # A queue finished earlier today doesn't count: start a new one, which
+    # picks up anything discovered since.
+    if queue.remaining():
+        LOG.info('Resuming the work queue saved earlier today.')
+    else:
+        queue.save(get_applications_needing_scraping())
+
+    spatial.ensure_index()
+    search.ensure_index()
+
+    parse_cache = ParseCache()
+    try:
+        refresh_applications(queue, parse_cache)
+    finally:
+        parse_cache.close()
+
 
-        LOG.info('Updating northgate id {}, url {}'.format(northgate_id, url))
+def refresh_applications(queue, parse_cache=None):
+    """
+    Scrape each application remaining in the queue. Server errors don't
+    abort the run: the application is retried later with backoff, and while
+    the council server's circuit is open we wait (up to MAX_CIRCUIT_WAIT in
+    total) before carrying on.
+    """
+
+    to_do = deque(
+        (row['northgate_id'], row['url'], 1) for row in queue.remaining()
+    )
+    retries = []  # heap of (ready_at, northgate_id, url, attempt)
+    circuit_wait = 0
 
-        new_row = {
-            'northgate_id': northgate_id
-        }
-        new_row.update(scrape_single_application(url))
+    while to_do or retries:
+        if retries and (not to_do or retries[0][0] <= time.time()):
+            ready_at, northgate_id, url, attempt = heapq.heappop(retries)
+            time.sleep(max(0, ready_at - time.time()))
+        else:
+            northgate_id, url, attempt = to_do.popleft()
 
         try:
-            applications.upsert(new_row, 'northgate_id')
-        except:
-            pprint(new_row)
-            raise
+            refresh_application(northgate_id, url, parse_cache)
+
+        except CircuitOpenError as e:
+            if circuit_wait + e.retry_after > MAX_CIRCUIT_WAIT:
+                LOG.error('{}. Giving up on this run with {} applications '
+                          'left.'.format(e, len(to_do) + len(retries) + 1))
+                break
+
+            LOG.warn('{}. Waiting.'.format(e))
+            time.sleep(e.retry_after)
+            circuit_wait += e.retry_after
+            to_do.appendleft((northgate_id, url, attempt))
+
+        except requests.RequestException as e:
+            if is_server_error(e) and attempt < MAX_ATTEMPTS:
+                delay = backoff_delay(attempt)
+                LOG.warn('Failed to fetch {} ({}), retrying in {}s'.format(
+                    url, e, delay))
+                heapq.heappush(
+                    retries,
+                    (time.time() + delay, northgate_id, url, attempt + 1)
+                )
+            else:
+                LOG.error('Giving up on {} after {} attempt(s): {}'.format(
+                    url, attempt, e))
+
+        else:
+            queue.mark_done(northgate_id)
+
+    LOG.info('Circuit breaker metrics: {}'.format(all_metrics()))
+
+
+def refresh_application(northgate_id, url, parse_cache=None):
+    LOG.info('Updating northgate id {}, url {}'.format(northgate_id, url))
+
+    application = scrape_single_application(
+        url, breaker_for(url), parse_cache
+    )
+    new_row = application.to_row(northgate_id=northgate_id)
+
+    try:
+        applications_table().upsert(new_row, 'northgate_id')
+    except:
+        pprint(new_row)
+        raise
+
+    spatial.index_application(
+        northgate_id, application.geo_easting, application.geo_northing
+    )
+    search.index_application(northgate_id, application)
 
 
 def export_data_to_files():
@@ -77,8 +180,19 @@ def configure_logging():
     LOG = logging.getLogger('')
 
 
+def discovery_interrupted():
+    """
+    Discovery upserts applications as it goes, newest first, so after a
+    crash the most recent received date looks up to date even though older
+    dates were never searched: check today's checkpoint as well.
+    """
+    return DiscoveryCheckpoint().unfinished(
+        RecentApplicationsScraper._last_30_days()
+    )
+
+
 def recent_applications_needs_updating():
-    most_recent = applications.find_one(order_by='-received_date')
+    most_recent = applications_table().find_one(order_by='-received_date')
     if most_recent is None:
         return True
 
@@ -94,90 +208,31 @@ def file_age_in_seconds(pathname):
 def get_applications_needing_scraping():
     """
     Return applications (database rows) that need re-scraping according to
-    a schedule.
+    a schedule (see `sql.SQL_IS_DUE`).
     Keep returning to applications, but do it less frequently as they become
-    older.
+    older. Due applications are ordered by priority (see `scheduler`) and
+    capped at FETCH_BUDGET.
     """
 
-    need_updating = []
+    due = list(database().query(
+        'SELECT * FROM applications WHERE {}'.format(SQL_IS_DUE)
+    ))
+    totally_new = sum(1 for row in due if row['extract_datetime'] is None)
 
-    totally_new = list(applications.find(extract_datetime=None))
-    zero_to_ninety = find_applications_need_refreshing_0_to_90_days()
-    ninety_one_to_365 = find_applications_need_refreshing_91_to_365_days()
-    one_year_plus = find_applications_need_refreshing_365_days_plus()
+    LOG.info('{} applications due: {} totally new, {} to refresh'.format(
+        len(due), totally_new, len(due) - totally_new))
 
-    random.shuffle(totally_new)
-    random.shuffle(zero_to_ninety)
-    random.shuffle(ninety_one_to_365)
-    random.shuffle(one_year_plus)
+    need_updating = prioritise(due, budget=FETCH_BUDGET)
 
-    need_updating.extend(totally_new)
-    need_updating.extend(zero_to_ninety)
-    need_updating.extend(ninety_one_to_365)
-    need_updating.extend(one_year_plus)
+    LOG.info('Fetching the top {} by priority (budget {})'.format(
+        len(need_updating), FETCH_BUDGET))
 
-    LOG.info('{} totally new, {} 0-90 days, {} 91-365 days, '
-             '{} 365+ days'.format(
-                 len(totally_new), len(zero_to_ninety), len(ninety_one_to_365),
-                 len(one_year_plus)))
-
-    time.sleep(10)
+    time.sleep(PAUSE_BEFORE_REFRESH)
     return need_updating
 
 
-def find_applications_need_refreshing_0_to_90_days():
-    """
-    Visit applications received within 90 days every day as this is the
-    period where they change the most.
-    """
-
-    query = (
-        'SELECT * from applications WHERE '
-        '    {days_since_scrape} > 0.8 AND '
-        '    {days_since_received} < 90'.format(
-                days_since_scrape=SQL_DAYS_SINCE_SCRAPE,
-                days_since_received=SQL_DAYS_SINCE_RECEIVED
-            )
-    )
-
-    return list(db.query(query))
-
-
-def find_applications_need_refreshing_91_to_365_days():
-    """
-    Visit applications that are 3-12 months old every week as they probably
-    aren't changing much.
-    """
-
-    query = (
-        'SELECT * from applications WHERE '
-        '    {days_since_scrape} >= 6.5 AND '
-        '    90 <= {days_since_received} AND '
-        '    {days_since_received} < 365'.format(
-                days_since_scrape=SQL_DAYS_SINCE_SCRAPE,
-                days_since_received=SQL_DAYS_SINCE_RECEIVED
-            )
-    )
-    return list(db.query(query))
-
-
-def find_applications_need_refreshing_365_days_plus():
-    """
-    Visit 1 year+ old applications once per month
-    """
-
-    query = (
-        'SELECT * from applications WHERE '
-        '    {days_since_scrape} >= 29.5 AND '
-        '    365 <= {days_since_received}'.format(
-                days_since_scrape=SQL_DAYS_SINCE_SCRAPE,
-                days_since_received=SQL_DAYS_SINCE_RECEIVED
-            )
-    )
-    return list(db.query(query))
-
-
-def find_recent_applications():
+def find_recent_applications(search_url=None):
+    applications = applications_table()
 
     try:
         LOG.info("Starting browser with Webdriver.")
@@ -187,7 +242,7 @@ def find_recent_applications():
         raise
 
     try:
-        scraper = RecentApplicationsScraper(webdriver)
+        scraper = RecentApplicationsScraper(webdriver, search_url)
 
     except Exception as e:
         webdriver.quit()
@@ -195,7 +250,7 @@ def find_recent_applications():
         raise
 
     try:
-        for row in scraper.get_applications():
+        for row in scraper.get_applications(DiscoveryCheckpoint()):
             print('{}'.format(row['northgate_id']))
             applications.upsert(row, ['northgate_id'])
 
@@ -226,8 +281,11 @@ def dump_screenshot_and_source(webdriver):
 
         webdriver.get_screenshot_as_file(screenshot_filename)
 
-        with io.open(html_filename, 'wb') as f:
-            f.write(webdriver.page_source.encode('utf-8'))
+        page_source = webdriver.page_source
+        with io.open(html_filename, 'w', encoding='utf-8') as f:
+            # In slices, so only 64KB is ever encoded at once.
+            for start in range(0, len(page_source), 64 * 1024):
+                f.write(page_source[start:start + 64 * 1024])
 
         return screenshot_filename, html_filename
 
@@ -1,29 +1,25 @@
+import hashlib
 import json
 import logging
+from collections import OrderedDict
 from os.path import abspath, dirname, join as pjoin
 import os
-from collections import OrderedDict
 
 from atomicfile import AtomicFile
 import dataset
 
-from .db import db
-from .sql import SQL_DAYS_SINCE_RECEIVED, SQL_DAYS_SINCE_SCRAPE
+from .db import database
+from .sql import SQL_DAYS_SINCE_SCRAPE
 
 YEAR_TO_DATE_FILENAME = pjoin('applications', 'year_to_date.{fmt}')
 BY_NUMBER_FILENAME = pjoin('applications', 'by-number',
                            '{application_number}.json')
+BY_MONTH_FILENAME = pjoin('applications', 'by-received-month',
+                          '{month}.{fmt}')
+BY_MONTH_INDEX_FILENAME = pjoin('applications', 'by-received-month',
+                                'index.json')
 
 
-YEAR_TO_DATE_QUERY = (
-    'SELECT * from applications WHERE '
-    '    {days_since_received} <= 365 '
-    'ORDER BY received_date, northgate_id'.format(
-            days_since_scrape=SQL_DAYS_SINCE_SCRAPE,
-            days_since_received=SQL_DAYS_SINCE_RECEIVED
-        )
-)
-
 RECENTLY_EXTRACTED_QUERY = (
     'SELECT * from applications WHERE '
     '    {days_since_scrape} <= 7 AND '
@@ -33,29 +29,202 @@ RECENTLY_EXTRACTED_QUERY = (
         )
 )
 
+MONTH_QUERY = (
+    'SELECT * from applications WHERE '
+    '    received_date >= :start AND received_date < :end '
+    'ORDER BY received_date, northgate_id'
+)
+
+# Months containing applications scraped since `since`, or never scraped.
+CHANGED_MONTHS_QUERY = (
+    'SELECT DISTINCT substr(received_date, 1, 7) AS month '
+    'FROM applications WHERE '
+    '    received_date NOT NULL AND '
+    '    (extract_datetime IS NULL OR extract_datetime >= :since)'
+)
+
+ALL_MONTHS_QUERY = (
+    'SELECT DISTINCT substr(received_date, 1, 7) AS month '
+    'FROM applications WHERE received_date NOT NULL'
+)
+
+# Columns that change every time an application is scraped, whether or not
+# anything on its page did: they're left out of the monthly files, so a
+# month is only rewritten when its applications have.
+SCRAPE_ONLY_COLUMNS = ['extract_datetime']
+
 LOG = logging.getLogger(__name__)
 
 
 def output_data(directory):
-    output_year_to_date(directory)
+    remove_year_to_date(directory)
+    output_by_received_month(directory)
     output_by_application_number(directory)
 
 
-def output_year_to_date(directory):
+def remove_year_to_date(directory):
+    """
+    The monthly files replace the old single year-to-date export: delete it
+    rather than leave it in the data repo going stale.
+    """
     for fmt in ['csv', 'json']:
         filename = abspath(
             pjoin(directory, YEAR_TO_DATE_FILENAME).format(fmt=fmt)
         )
 
+        if os.path.exists(filename):
+            LOG.info("Removing {}".format(filename))
+            os.remove(filename)
+
+
+def output_by_received_month(directory):
+    """
+    Write one CSV and one JSON file per month of received date, plus an
+    index of them. Only months with applications scraped since the last
+    export are looked at, and a month's files are only rewritten if its
+    rows' data has changed (not just when they were scraped), so the files
+    (and the data repo's diffs) only change where the data did.
+    """
+    database()['applications'].create_index(['received_date'])
+
+    index_filename = abspath(pjoin(directory, BY_MONTH_INDEX_FILENAME))
+    index = load_month_index(index_filename)
+    shards = {shard['month']: shard for shard in index['shards']}
+
+    high_water_mark = list(database().query(
+        'SELECT MAX(extract_datetime) AS latest FROM applications'
+    ))[0]['latest']
+
+    for month in months_to_check(directory, index['high_water_mark'], shards):
+        rows = database().query(MONTH_QUERY, **month_range(month))
+        count, digest = hash_rows(rows)
+
+        shard = shards.get(month, {})
+        if shard.get('sha1') == digest and shard_exists(directory, month):
+            continue
+
+        write_month(directory, month)
+        shards[month] = {
+            'month': month,
+            'rows': count,
+            'sha1': digest,
+            'csv': '{}.csv'.format(month),
+            'json': '{}.json'.format(month),
+        }
+
+    write_if_changed(index_filename, json.dumps({
+        'high_water_mark': high_water_mark,
+        'shards': [shards[month] for month in sorted(shards)],
+    }, indent=4, sort_keys=True))
+
+
+def months_to_check(directory, since, shards):
+    """
+    Months which may have changed since the last export (all of them if
+    there wasn't one), plus any whose files have gone missing.
+    """
+    if since is None:
+        rows = database().query(ALL_MONTHS_QUERY)
+    else:
+        rows = database().query(CHANGED_MONTHS_QUERY, since=since)
+
+    months = set(row['month'] for row in rows)
+    months.update(
+        month for month in shards if not shard_exists(directory, month)
+    )
+    return sorted(months)
+
+
+def month_range(month):
+    """
+    '2016-12' -> {'start': '2016-12-01', 'end': '2017-01-01'}
+    """
+    year, month_number = map(int, month.split('-'))
+    if month_number == 12:
+        year, month_number = year + 1, 1
+    else:
+        month_number += 1
+
+    return {
+        'start': '{}-01'.format(month),
+        'end': '{:04d}-{:02d}-01'.format(year, month_number),
+    }
+
+
+def hash_rows(rows):
+    """
+    Return the number of rows and a hash of their data, ignoring
+    SCRAPE_ONLY_COLUMNS.
+    """
+    digest = hashlib.sha1()
+    count = 0
+    for data in without_scrape_only_columns(rows):
+        digest.update(json.dumps(data, default=str, sort_keys=True).encode())
+        count += 1
+    return count, digest.hexdigest()
+
+
+def without_scrape_only_columns(rows):
+    for row in rows:
+        yield OrderedDict(
+            (column, value) for column, value in row.items()
+            if column not in SCRAPE_ONLY_COLUMNS
+        )
+
+
+def write_month(directory, month):
+    for fmt in ['csv', 'json']:
+        filename = month_filename(directory, month, fmt)
+        mkdir_p(dirname(filename))
+
         LOG.info("Writing {}".format(filename))
 
+        rows = without_scrape_only_columns(
+            database().query(MONTH_QUERY, **month_range(month)))
+
+        # One field per line, so the data repo's diffs show what changed.
+        options = {'indent': 4} if fmt == 'json' else {}
+
         with AtomicFile(filename, 'w') as f:
-            dataset.freeze(db.query(YEAR_TO_DATE_QUERY), format=fmt, fileobj=f)
+            dataset.freeze(rows, format=fmt, fileobj=f, **options)
+
+
+def month_filename(directory, month, fmt):
+    return abspath(pjoin(directory, BY_MONTH_FILENAME).format(
+        month=month, fmt=fmt))
+
+
+def shard_exists(directory, month):
+    return all(
+        os.path.exists(month_filename(directory, month, fmt))
+        for fmt in ['csv', 'json']
+    )
+
+
+def load_month_index(filename):
+    if not os.path.exists(filename):
+        return {'high_water_mark': None, 'shards': []}
+
+    with open(filename) as f:
+        return json.load(f)
+
+
+def write_if_changed(filename, content):
+    if os.path.exists(filename):
+        with open(filename) as f:
+            if f.read() == content:
+                return
+
+    mkdir_p(dirname(filename))
+    LOG.info("Writing {}".format(filename))
+
+    with AtomicFile(filename, 'w') as f:
+        f.write(content)
 
 
 def output_by_application_number(directory):
 
-    for row in db.query(RECENTLY_EXTRACTED_QUERY):
+    for row in database().query(RECENTLY_EXTRACTED_QUERY):
         filename = abspath(pjoin(directory, BY_NUMBER_FILENAME)).format(
             application_number=row['application_number']
         )
@@ -65,11 +234,7 @@ def output_by_application_number(directory):
         LOG.info("Writing {}".format(filename))
 
         with AtomicFile(filename, 'w') as f:
-            json.dump(sort_by_key(row), f, indent=4)
-
-
-def sort_by_key(dictionary):
-    return OrderedDict(sorted(dictionary.items()))
+            json.dump(row, f, indent=4, sort_keys=True)
 
 
 def mkdir_p(directory):
@@ -0,0 +1,116 @@
+"""
+Memoise page parsing, keyed by a hash of the page bytes and the parser
+version, so an unchanged page is never parsed twice.
+"""
+
+import hashlib
+import logging
+import pickle
+import sqlite3
+import time
+import zlib
+
+LOG = logging.getLogger(__name__)
+
+
+class ParseCache():
+    """
+    A size-bounded SQLite store of parse results. Results are pickled and
+    zlib-compressed; the least recently used entries are dropped once there
+    are more than `max_entries`.
+
+    Cache hits don't write: their last-used times are kept in memory and
+    saved along with the next new entry, prune or close.
+    """
+
+    PRUNE_EVERY = 500  # writes
+
+    def __init__(self, filename='parse_cache.db', max_entries=100000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._touched = {}  # key -> last used, not yet saved
+
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS parsed_pages ('
+            '    key TEXT PRIMARY KEY, '
+            '    result BLOB NOT NULL, '
+            '    last_used REAL NOT NULL'
+            ')'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS parsed_pages_last_used '
+            'ON parsed_pages (last_used)'
+        )
+        self.connection.commit()
+
+    def get_or_parse(self, page_bytes, parse, parser_version):
+        """
+        Return `parse(page_bytes)`, from the cache if this exact page has
+        been parsed before by this version of the parser.
+        """
+        key = make_key(page_bytes, parser_version)
+
+        row = self.connection.execute(
+            'SELECT result FROM parsed_pages WHERE key = ?', (key,)
+        ).fetchone()
+
+        if row is not None:
+            self.hits += 1
+            self._touched[key] = time.time()
+            return pickle.loads(zlib.decompress(row[0]))
+
+        self.misses += 1
+        result = parse(page_bytes)
+        self._put(key, result)
+        return result
+
+    def _put(self, key, result):
+        blob = zlib.compress(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+
+        self.connection.execute(
+            'INSERT OR REPLACE INTO parsed_pages (key, result, last_used) '
+            'VALUES (?, ?, ?)',
+            (key, sqlite3.Binary(blob), time.time())
+        )
+
+        self._save_touches()
+
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+        self.connection.commit()
+
+    def _save_touches(self):
+        self.connection.executemany(
+            'UPDATE parsed_pages SET last_used = ? WHERE key = ?',
+            [(last_used, key) for key, last_used in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def prune(self):
+        self._save_touches()
+        self.connection.execute(
+            'DELETE FROM parsed_pages WHERE key NOT IN ('
+            '    SELECT key FROM parsed_pages '
+            '    ORDER BY last_used DESC LIMIT ?'
+            ')',
+            (self.max_entries,)
+        )
+
+    def close(self):
+        LOG.info('Parse cache: {} hits, {} misses'.format(
+            self.hits, self.misses))
+        self._save_touches()
+        self.connection.commit()
+        self.connection.close()
+
+
+def make_key(page_bytes, parser_version):
+    digest = hashlib.sha256(page_bytes)
+    digest.update(b'\0')
+    digest.update(parser_version.encode('utf-8'))
+    return digest.hexdigest()
@@ -44,12 +44,24 @@ class RecentApplicationsScraper():
         "//td[@title='View Application Details']/a"
     )
 
-    def __init__(self, webdriver):
+    def __init__(self, webdriver, search_url=None):
         self.d = webdriver
+        if search_url is not None:
+            self.ADVANCED_SEARCH_URL = search_url
         self.wait = WebDriverWait(self.d, 20)
 
-    def get_applications(self):
+    def get_applications(self, checkpoint=None):
+        """
+        Yield applications received in the last 30 days. If a `checkpoint`
+        (see `checkpoints.DiscoveryCheckpoint`) is given, dates already
+        searched in this run are skipped and results pages already saved
+        are paged past without being yielded again.
+        """
         for date in self._last_30_days():
+            if checkpoint is not None and checkpoint.is_complete(date):
+                LOG.info('Already searched {}, skipping'.format(date))
+                continue
+
             print("Getting applications received {}".format(date))
 
             self._navigate_to_advanced_search_page()
@@ -57,9 +69,22 @@ class RecentApplicationsScraper():
             self._search_by_date_received_equal_to(date)
             self._wait_for_results_page()
 
-            for application in self._loop_through_search_result_pages():
-                application.update({'received_date': date})
-                yield application
+            pages_done = 0
+            if checkpoint is not None:
+                pages_done = checkpoint.pages_done(date)
+
+            pages = self._loop_through_search_result_pages(skip=pages_done)
+
+            for page_number, page in enumerate(pages, pages_done + 1):
+                for application in page:
+                    application.update({'received_date': date})
+                    yield application
+
+                if checkpoint is not None:
+                    checkpoint.mark_page_done(date, page_number)
+
+            if checkpoint is not None:
+                checkpoint.mark_complete(date)
 
     @staticmethod
     def _last_30_days():
@@ -117,24 +142,40 @@ class RecentApplicationsScraper():
 
         self.wait.until(find_results_table_or_no_results)
 
-    def _loop_through_search_result_pages(self):
+    def _loop_through_search_result_pages(self, skip=0):
+        """
+        Yield a list of applications for each results page, after first
+        clicking past `skip` pages.
+        """
+        for _ in range(skip):
+            if not self._go_to_next_page():
+                return
+
         while True:
+            page = []
             for td in self.d.find_elements(*self.APPLICATION_NUMBER_A):
                 url = td.get_attribute('href')
                 northgate_id = self._parse_northgate_id(url)
 
-                yield {
+                page.append({
                     'northgate_id': northgate_id,
                     'url': url,
-                }
+                })
+
+            yield page
 
-            try:
-                self.d.find_element(*self.NEXT_PAGE_A).click()
-            except NoSuchElementException:  # no more pages OR "no results"
+            if not self._go_to_next_page():
                 break
-            else:
-                time.sleep(2)  # chill out
-                self._wait_for_results_page()
+
+    def _go_to_next_page(self):
+        try:
+            self.d.find_element(*self.NEXT_PAGE_A).click()
+        except NoSuchElementException:  # no more pages OR "no results"
+            return False
+        else:
+            time.sleep(2)  # chill out
+            self._wait_for_results_page()
+            return True
 
     @staticmethod
     def _parse_northgate_id(url):
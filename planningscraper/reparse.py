@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""
+Reparse saved application pages with the current parser and print one JSON
+object per page, for checking a parser change against a pile of pages.
+
+    python -m planningscraper.reparse saved_pages/*.html --workers 4
+
+Each page is streamed through `iterparse_application_fields`, so a worker
+only ever holds the fields it has found, however large the pages are.
+"""
+
+import argparse
+import functools
+import io
+import json
+import multiprocessing
+import sys
+
+from .application_scraper import iterparse_application_fields
+
+
+def reparse_file(filename, encoding=None):
+    with io.open(filename, 'rb') as f:
+        return iterparse_application_fields(f, encoding)
+
+
+def reparse_files(filenames, workers=1, encoding=None):
+    """
+    Yield (filename, Application) for each of `filenames`, in order.
+    """
+    if workers == 1:
+        for filename in filenames:
+            yield filename, reparse_file(filename, encoding)
+        return
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        applications = pool.imap(
+            functools.partial(reparse_file, encoding=encoding),
+            filenames, chunksize=16
+        )
+        for filename, application in zip(filenames, applications):
+            yield filename, application
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(argv):
+    args = _parse_args(argv)
+
+    for filename, application in reparse_files(
+            args.filenames, args.workers, args.encoding):
+        row = application.as_dict()
+        row['filename'] = filename
+        print(json.dumps(row, default=str, sort_keys=True))
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Reparse saved application pages.')
+    parser.add_argument('filenames', nargs='+', metavar='page.html')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--encoding',
+                        help="the pages' character set (default UTF-8)")
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
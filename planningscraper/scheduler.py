@@ -0,0 +1,103 @@
+import datetime
+import random
+
+# Statuses after which an application page rarely changes again.
+FINAL_STATUSES = set([
+    'APPROVED',
+    'DECIDED',
+    'DISPOSED',
+    'FINAL DECISION',
+    'REFUSED',
+    'WITHDRAWN',
+])
+
+NEVER_SCRAPED_SCORE = 1000.0
+
+
+def prioritise(rows, budget=None, today=None):
+    """
+    Order due applications (database rows) so that the pages most likely to
+    have changed are fetched first, and cut the list down to `budget` rows.
+
+    Rows with equal scores are shuffled so a cut-short run doesn't keep
+    visiting the same applications.
+    """
+
+    if today is None:
+        today = datetime.date.today()
+
+    rows = list(rows)
+    random.shuffle(rows)
+    rows.sort(key=lambda row: score_application(row, today), reverse=True)
+
+    if budget is not None:
+        rows = rows[:budget]
+
+    return rows
+
+
+def score_application(row, today):
+    """
+    Return a score for how likely an application page is to have changed
+    since we last saw it. Higher means fetch sooner.
+    """
+
+    extract_datetime = as_datetime(row.get('extract_datetime'))
+    if extract_datetime is None:
+        return NEVER_SCRAPED_SCORE
+
+    score = 0.0
+
+    committee_date = as_date(row.get('committee_date'))
+    if committee_date is not None:
+        days_until_committee = (committee_date - today).days
+        if -2 <= days_until_committee <= 14:
+            score += 100 - 5 * max(days_until_committee, 0)
+
+    comments_until_date = as_date(row.get('comments_until_date'))
+    if comments_until_date is not None:
+        days_until_comments_close = (comments_until_date - today).days
+        if days_until_comments_close >= 0:
+            score += 30
+        elif days_until_comments_close >= -7:
+            score += 20  # likely to move to committee / decision soon
+
+    if row.get('decision') is None:
+        score += 20
+
+    status = (row.get('current_status') or '').strip().upper()
+    if status in FINAL_STATUSES:
+        score -= 30
+
+    days_since_scrape = (today - extract_datetime.date()).days
+    score += min(max(days_since_scrape, 0), 60)
+
+    return score
+
+
+def as_date(value):
+    """
+    Rows from `db.query` give dates as ISO strings, rows from the table API
+    give `datetime.date` objects. Accept either.
+    """
+    if value is None or value == '':
+        return None
+    elif isinstance(value, datetime.datetime):
+        return value.date()
+    elif isinstance(value, datetime.date):
+        return value
+    else:
+        return datetime.datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def as_datetime(value):
+    if value is None or value == '':
+        return None
+    elif isinstance(value, datetime.datetime):
+        return value
+    elif isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    else:
+        return datetime.datetime.strptime(
+            value[:19].replace('T', ' '), '%Y-%m-%d %H:%M:%S'
+        )
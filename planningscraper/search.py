@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+"""
+Full-text search over application descriptions, site addresses, applicants
+and agents, using an SQLite FTS5 index.
+
+    python -m planningscraper.search rebuild
+    python -m planningscraper.search query brewery
+    python -m planningscraper.search query "change of use" --postcode L15
+    python -m planningscraper.search query "extension" --postcode "l25 7"
+"""
+
+import argparse
+import json
+import logging
+import sys
+
+from .application_scraper import normalise_postcode
+from .db import database, execute, table_exists
+
+LOG = logging.getLogger(__name__)
+
+INDEX_TABLE = 'applications_fts'
+
+INDEXED_COLUMNS = ['description', 'site_address', 'applicant', 'agent']
+
+# bm25() weights for INDEXED_COLUMNS: a match in the description counts for
+# most.
+COLUMN_WEIGHTS = [10.0, 5.0, 2.0, 2.0]
+
+
+def ensure_index():
+    """
+    Create the index, filling it from existing applications, if it doesn't
+    exist yet.
+    """
+    if not table_exists(INDEX_TABLE):
+        rebuild_index()
+
+
+def _create_index():
+    execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5('
+        '    {}, postcode UNINDEXED, '
+        "    tokenize = 'porter unicode61'"
+        ')'.format(INDEX_TABLE, ', '.join(INDEXED_COLUMNS))
+    )
+
+
+def index_application(northgate_id, application):
+    """
+    Replace one application's entry in the index. Called alongside every
+    upsert of application data.
+    """
+    execute(
+        'DELETE FROM {} WHERE rowid = :northgate_id'.format(INDEX_TABLE),
+        northgate_id=northgate_id
+    )
+
+    execute(
+        'INSERT INTO {index} (rowid, {columns}, postcode) '
+        'VALUES (:northgate_id, {values}, :postcode)'.format(
+            index=INDEX_TABLE,
+            columns=', '.join(INDEXED_COLUMNS),
+            values=', '.join(':' + column for column in INDEXED_COLUMNS)
+        ),
+        northgate_id=northgate_id,
+        postcode=application['postcode'],
+        **{column: application[column] for column in INDEXED_COLUMNS}
+    )
+
+
+def rebuild_index():
+    _create_index()
+    execute('DELETE FROM {}'.format(INDEX_TABLE))
+
+    columns = database()['applications'].columns
+    if not all(column in columns for column in INDEXED_COLUMNS + ['postcode']):
+        return  # nothing scraped yet
+
+    execute(
+        'INSERT INTO {index} (rowid, {columns}, postcode) '
+        'SELECT northgate_id, {columns}, postcode FROM applications'.format(
+            index=INDEX_TABLE,
+            columns=', '.join(INDEXED_COLUMNS)
+        )
+    )
+    execute(
+        "INSERT INTO {index} ({index}) VALUES ('optimize')".format(
+            index=INDEX_TABLE)
+    )
+
+
+def search(query, postcode=None, limit=20):
+    """
+    Return applications (database rows) matching all the words in `query`,
+    best match first. A word ending in `*` matches as a prefix
+    ('brew*' finds 'brewery'). `postcode` restricts results to a full or
+    partial postcode ('L15', 'l15 3', 'L15 3JL'). A query with no words
+    in it matches nothing.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    # Not `:query`, which would clash with Database.query's own argument.
+    conditions = ['{} MATCH :expression'.format(INDEX_TABLE)]
+    params = {'expression': expression, 'limit': limit}
+
+    if postcode is not None:
+        conditions.append('{}.postcode LIKE :postcode'.format(INDEX_TABLE))
+        params['postcode'] = postcode_like_pattern(postcode)
+
+    return list(database().query(
+        'SELECT applications.*, bm25({index}, {weights}) AS rank '
+        'FROM {index} '
+        'JOIN applications ON applications.northgate_id = {index}.rowid '
+        'WHERE {conditions} '
+        'ORDER BY rank '
+        'LIMIT :limit'.format(
+            index=INDEX_TABLE,
+            weights=', '.join(str(weight) for weight in COLUMN_WEIGHTS),
+            conditions=' AND '.join(conditions)
+        ),
+        **params
+    ))
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query, quoting each word so that characters
+    with special meaning to FTS5 are searched for literally:
+    'nano brew*' -> '"nano" "brew"*'
+    """
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append('"{}"{}'.format(word, '*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def postcode_like_pattern(postcode):
+    """
+    'l15 3jl' -> 'L15 3JL', 'l15 3' -> 'L15 3%', 'L15' -> 'L15 %'
+    """
+    full = normalise_postcode(postcode)
+    if full is not None:
+        return full
+
+    parts = postcode.upper().split()
+    if len(parts) == 1:
+        return parts[0] + ' %'  # outward code: 'L1' mustn't match 'L15'
+    else:
+        return ' '.join(parts) + '%'
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    args = _parse_args(argv)
+
+    if args.command == 'rebuild':
+        rebuild_index()
+        LOG.info('Rebuilt search index')
+        return
+
+    ensure_index()
+
+    for row in search(args.query, postcode=args.postcode, limit=args.limit):
+        print(json.dumps(row, default=str, sort_keys=True))
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Search application descriptions, addresses, '
+                    'applicants and agents.')
+
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    commands.add_parser('rebuild', help='rebuild the index from scratch')
+
+    query = commands.add_parser('query', help='search for applications')
+    query.add_argument('query')
+    query.add_argument('--postcode', help="full or partial, e.g. 'L15'")
+    query.add_argument('--limit', type=int, default=20)
+
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
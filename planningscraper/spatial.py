@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""
+Find applications by location, using an SQLite R*Tree index over each
+application's easting/northing (British National Grid, in metres).
+
+    python -m planningscraper.spatial rebuild
+    python -m planningscraper.spatial bbox 342000 384000 343000 385000
+    python -m planningscraper.spatial radius 342314 384865 500
+    python -m planningscraper.spatial nearest 53.3575 -2.8682 10 --lat-lng
+    python -m planningscraper.spatial wards
+    python -m planningscraper.spatial wards --bbox 342000 384000 343000 385000
+"""
+
+import argparse
+import json
+import logging
+import math
+import sys
+
+from bng_to_latlon import WGS84toOSGB36
+
+from .db import database, execute, table_exists
+
+LOG = logging.getLogger(__name__)
+
+INDEX_TABLE = 'applications_rtree'
+
+# `nearest` widens its search from this radius until it has enough results.
+NEAREST_START_RADIUS = 250
+NEAREST_MAX_RADIUS = 50000
+
+
+def ensure_index():
+    """
+    Create the index, filling it from existing applications, if it doesn't
+    exist yet.
+    """
+    if not table_exists(INDEX_TABLE):
+        rebuild_index()
+
+
+def _create_index():
+    execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS {} USING rtree('
+        '    northgate_id, '
+        '    min_easting, max_easting, '
+        '    min_northing, max_northing'
+        ')'.format(INDEX_TABLE)
+    )
+
+
+def index_application(northgate_id, easting, northing):
+    """
+    Add, move or remove (if it has no location) one application in the
+    index. Called alongside every upsert of application data.
+    """
+    if easting is None or northing is None:
+        execute(
+            'DELETE FROM {} WHERE northgate_id = :northgate_id'.format(
+                INDEX_TABLE),
+            northgate_id=northgate_id
+        )
+    else:
+        execute(
+            'INSERT OR REPLACE INTO {} VALUES ('
+            '    :northgate_id, :easting, :easting, :northing, :northing'
+            ')'.format(INDEX_TABLE),
+            northgate_id=northgate_id, easting=easting, northing=northing
+        )
+
+
+def rebuild_index():
+    _create_index()
+    execute('DELETE FROM {}'.format(INDEX_TABLE))
+    execute(
+        'INSERT INTO {} '
+        'SELECT northgate_id, geo_easting, geo_easting, '
+        '       geo_northing, geo_northing '
+        'FROM applications '
+        'WHERE geo_easting IS NOT NULL AND geo_northing IS NOT NULL'.format(
+            INDEX_TABLE)
+    )
+
+
+def within_bbox(min_easting, min_northing, max_easting, max_northing):
+    """
+    Return applications (database rows) inside the given box.
+    """
+    return list(database().query(
+        'SELECT applications.* FROM {index} '
+        'JOIN applications USING (northgate_id) WHERE '
+        '    {index}.max_easting >= :min_easting AND '
+        '    {index}.min_easting <= :max_easting AND '
+        '    {index}.max_northing >= :min_northing AND '
+        '    {index}.min_northing <= :max_northing'.format(index=INDEX_TABLE),
+        min_easting=min_easting, max_easting=max_easting,
+        min_northing=min_northing, max_northing=max_northing
+    ))
+
+
+def within_radius(easting, northing, radius):
+    """
+    Return applications within `radius` metres, nearest first, each with an
+    added `distance` (in metres).
+    """
+    rows = within_bbox(
+        easting - radius, northing - radius,
+        easting + radius, northing + radius
+    )
+
+    for row in rows:
+        row['distance'] = _distance(easting, northing, row)
+
+    return sorted(
+        (row for row in rows if row['distance'] <= radius),
+        key=lambda row: row['distance']
+    )
+
+
+def nearest(easting, northing, count):
+    """
+    Return the `count` applications nearest to the given point, nearest
+    first, each with an added `distance` (in metres).
+    """
+    radius = NEAREST_START_RADIUS
+
+    while True:
+        rows = within_radius(easting, northing, radius)
+        if len(rows) >= count or radius >= NEAREST_MAX_RADIUS:
+            return rows[:count]
+        radius *= 2
+
+
+def ward_counts(bbox=None):
+    """
+    Return the number of applications (and number decided) per ward,
+    optionally only those inside `bbox` (min_easting, min_northing,
+    max_easting, max_northing).
+    """
+    if 'wards' not in database()['applications'].columns:
+        return []  # nothing scraped yet
+
+    if bbox is None:
+        source, params = 'applications', {}
+    else:
+        source = (
+            '(SELECT applications.* FROM {index} '
+            ' JOIN applications USING (northgate_id) WHERE '
+            '    {index}.max_easting >= :min_easting AND '
+            '    {index}.min_easting <= :max_easting AND '
+            '    {index}.max_northing >= :min_northing AND '
+            '    {index}.min_northing <= :max_northing)'.format(
+                index=INDEX_TABLE)
+        )
+        params = dict(zip(
+            ['min_easting', 'min_northing', 'max_easting', 'max_northing'],
+            bbox
+        ))
+
+    return list(database().query(
+        'SELECT wards, '
+        '       COUNT(*) AS applications, '
+        '       COUNT(decision) AS decided, '
+        '       MIN(received_date) AS first_received, '
+        '       MAX(received_date) AS last_received '
+        'FROM {} '
+        'WHERE wards IS NOT NULL '
+        'GROUP BY wards '
+        'ORDER BY applications DESC'.format(source),
+        **params
+    ))
+
+
+def _distance(easting, northing, row):
+    return math.hypot(
+        row['geo_easting'] - easting, row['geo_northing'] - northing
+    )
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    args = _parse_args(argv)
+
+    if args.command == 'rebuild':
+        rebuild_index()
+        LOG.info('Rebuilt spatial index')
+        return
+
+    ensure_index()
+
+    if args.command == 'wards':
+        bbox = None
+        if args.bbox is not None:
+            min_x, min_y, max_x, max_y = args.bbox
+            bbox = _to_grid(args, min_x, min_y) + _to_grid(args, max_x, max_y)
+        rows = ward_counts(bbox)
+    elif args.command == 'bbox':
+        min_easting, min_northing = _to_grid(args, args.min_x, args.min_y)
+        max_easting, max_northing = _to_grid(args, args.max_x, args.max_y)
+        rows = within_bbox(min_easting, min_northing,
+                           max_easting, max_northing)
+    elif args.command == 'radius':
+        rows = within_radius(*_to_grid(args, args.x, args.y),
+                             radius=args.metres)
+    elif args.command == 'nearest':
+        rows = nearest(*_to_grid(args, args.x, args.y), count=args.count)
+
+    for row in rows:
+        print(json.dumps(row, default=str, sort_keys=True))
+
+
+def _to_grid(args, x, y):
+    """
+    With --lat-lng, x and y are latitude and longitude: convert them to
+    (easting, northing).
+    """
+    if args.lat_lng:
+        easting, northing = WGS84toOSGB36(x, y)
+        return easting, northing
+    return x, y
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Query applications by location.')
+
+    coordinates = argparse.ArgumentParser(add_help=False)
+    coordinates.add_argument(
+        '--lat-lng', action='store_true',
+        help='coordinates are latitude, longitude rather than '
+             'easting, northing')
+
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    commands.add_parser('rebuild', help='rebuild the index from scratch')
+    wards = commands.add_parser(
+        'wards', parents=[coordinates],
+        help='number of applications per ward')
+    wards.add_argument(
+        '--bbox', type=float, nargs=4,
+        metavar=('MIN_X', 'MIN_Y', 'MAX_X', 'MAX_Y'),
+        help='only count applications inside this box')
+
+    bbox = commands.add_parser(
+        'bbox', parents=[coordinates], help='applications inside a box')
+    for name in ['min_x', 'min_y', 'max_x', 'max_y']:
+        bbox.add_argument(name, type=float)
+
+    radius = commands.add_parser(
+        'radius', parents=[coordinates],
+        help='applications within a distance of a point')
+    radius.add_argument('x', type=float)
+    radius.add_argument('y', type=float)
+    radius.add_argument('metres', type=float)
+
+    nearest = commands.add_parser(
+        'nearest', parents=[coordinates],
+        help='the N applications closest to a point')
+    nearest.add_argument('x', type=float)
+    nearest.add_argument('y', type=float)
+    nearest.add_argument('count', type=int)
+
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
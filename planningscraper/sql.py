@@ -1,2 +1,15 @@
 SQL_DAYS_SINCE_SCRAPE = "julianday('now')-julianday(extract_datetime)"
 SQL_DAYS_SINCE_RECEIVED = "julianday('now')-julianday(received_date)"
+
+# Never scraped, or not scraped for a while given how old the application
+# is: daily under 90 days, weekly under a year, monthly after that.
+SQL_IS_DUE = (
+    '(extract_datetime IS NULL OR '
+    ' ({days_since_scrape} > 0.8 AND {days_since_received} < 90) OR '
+    ' ({days_since_scrape} >= 6.5 AND '
+    '  90 <= {days_since_received} AND {days_since_received} < 365) OR '
+    ' ({days_since_scrape} >= 29.5 AND 365 <= {days_since_received}))'.format(
+        days_since_scrape=SQL_DAYS_SINCE_SCRAPE,
+        days_since_received=SQL_DAYS_SINCE_RECEIVED
+    )
+)
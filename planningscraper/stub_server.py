@@ -0,0 +1,362 @@
+#!/usr/bin/env python
+
+"""
+A local stand-in for the council's Northgate Planning Explorer, serving
+synthetic search forms, search results and application pages (built from
+the templates in `sample_data/application_pages`), with configurable
+latency and error rate.
+
+    python -m planningscraper.stub_server --port 8017 --latency 0.2
+
+then point the scraper at
+http://127.0.0.1:8017/PlanningExplorer17/GeneralSearch.aspx
+"""
+
+import argparse
+import datetime
+import glob
+import html
+import io
+import logging
+import multiprocessing
+import random
+import re
+import sys
+import threading
+import time
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from os.path import dirname, join as pjoin
+from socketserver import ThreadingMixIn
+from urllib.parse import urlparse, parse_qs, urlencode
+
+LOG = logging.getLogger(__name__)
+
+TEMPLATE_DIR = pjoin(dirname(__file__), 'sample_data', 'application_pages')
+
+SEARCH_PATH = '/PlanningExplorer17/GeneralSearch.aspx'
+RESULTS_PATH = '/PlanningExplorer17/Generic/StdResults.aspx'
+DETAILS_PATH = '/PlanningExplorer17/Generic/StdDetails.aspx'
+
+RESULTS_PER_PAGE = 10
+FIRST_NORTHGATE_ID = 2000000
+
+STREETS = ['Smithdown Road', 'Allerton Road', 'High Street', 'Lark Lane',
+           'Bold Street', 'Rodney Street', 'Aigburth Road', 'Church Road']
+WARDS = ['Allerton and Hunts Cross', 'Woolton', 'Greenbank', 'Riverside',
+         'Central', 'Picton', 'Wavertree', 'Mossley Hill']
+PROPOSALS = [
+    'To erect single storey extension at the rear',
+    'Change of use from shop (A1) to restaurant (A3)',
+    'To install new shopfront and illuminated signage',
+    'To erect two storey side extension and front porch',
+    'To convert dwelling into 3 self-contained flats',
+    'To demolish existing garage and erect detached dwelling',
+]
+STATUSES = ['REGISTERED', 'REGISTERED', 'PENDING CONSIDERATION', 'DECIDED']
+DECISIONS = ['Approved with Conditions', 'Refused', 'Withdrawn']
+
+
+class SyntheticApplications():
+    """
+    A deterministic set of `count` applications spread over the `days` days
+    before `today`.
+    """
+
+    def __init__(self, count, days=30, today=None):
+        self.count = count
+        self.days = days
+        self.today = today or datetime.date.today()
+        self.templates = [
+            _read(filename)
+            for filename in sorted(glob.glob(TEMPLATE_DIR + '/*.html'))
+        ]
+
+    def ids_received_between(self, start, end):
+        return [
+            northgate_id for northgate_id in self._all_ids()
+            if start <= self.received_date(northgate_id) <= end
+        ]
+
+    def received_date(self, northgate_id):
+        offset = 1 + (northgate_id - FIRST_NORTHGATE_ID) % self.days
+        return self.today - datetime.timedelta(days=offset)
+
+    def exists(self, northgate_id):
+        return 0 <= northgate_id - FIRST_NORTHGATE_ID < self.count
+
+    def application_number(self, northgate_id):
+        return '{:02d}F/{}'.format(
+            self.received_date(northgate_id).year % 100,
+            northgate_id - FIRST_NORTHGATE_ID
+        )
+
+    def page(self, northgate_id):
+        rand = random.Random(northgate_id)
+        template = self.templates[northgate_id % len(self.templates)]
+
+        received = self.received_date(northgate_id)
+        status = rand.choice(STATUSES)
+        decision = ''
+        if status == 'DECIDED':
+            decision = '{}\n{}'.format(
+                rand.choice(DECISIONS),
+                _format_date(received + datetime.timedelta(days=56))
+            )
+
+        address = '{} {}\nLiverpool\nL{} {}{}{}'.format(
+            rand.randint(1, 300), rand.choice(STREETS),
+            rand.randint(1, 27), rand.randint(1, 9),
+            rand.choice('ABDEFGHJLNPQRSTUWXYZ'),
+            rand.choice('ABDEFGHJLNPQRSTUWXYZ'),
+        )
+
+        fields = {
+            'Application Number': self.application_number(northgate_id),
+            'Site Address': address,
+            'Proposal': rand.choice(PROPOSALS),
+            'Current Status': status,
+            'Applicant': 'Applicant {}'.format(northgate_id),
+            'Wards': rand.choice(WARDS),
+            'Location Co ordinates': 'Easting {} Northing {}'.format(
+                rand.randint(335000, 345000), rand.randint(380000, 395000)),
+            'Comments Until': _format_date(
+                received + datetime.timedelta(days=21)),
+            'Decision': decision,
+        }
+
+        # Replace the text after each field's label, leaving any elements
+        # that follow it (like the "Add Comments Here" link) alone.
+        for name, value in fields.items():
+            template = re.sub(
+                '(<span>{}</span>)[^<]*'.format(re.escape(name)),
+                lambda match: '{}{} '.format(
+                    match.group(1), html.escape(value)),
+                template
+            )
+
+        return template
+
+    def _all_ids(self):
+        return range(FIRST_NORTHGATE_ID, FIRST_NORTHGATE_ID + self.count)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    applications = None
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+        if random.random() < self.error_rate:
+            self._send(503, 'Service Unavailable')
+            return
+
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == SEARCH_PATH:
+            self._send(200, SEARCH_FORM)
+        elif url.path == RESULTS_PATH:
+            self._send(200, self._results_page(query))
+        elif url.path == DETAILS_PATH:
+            self._details_page(query)
+        else:
+            self._send(404, 'Not Found')
+
+    def _results_page(self, query):
+        start = _parse_iso_date(query.get('dateStart'))
+        end = _parse_iso_date(query.get('dateEnd'))
+        page = int(query.get('page', 1))
+
+        if start is None or end is None:
+            return NO_RESULTS
+
+        ids = self.applications.ids_received_between(start, end)
+        first = (page - 1) * RESULTS_PER_PAGE
+        on_this_page = ids[first:first + RESULTS_PER_PAGE]
+
+        if not on_this_page:
+            return NO_RESULTS
+
+        rows = ''.join(
+            RESULT_ROW.format(
+                url=html.escape(_details_url(northgate_id)),
+                number=self.applications.application_number(northgate_id)
+            ) for northgate_id in on_this_page
+        )
+
+        next_link = ''
+        if len(ids) > page * RESULTS_PER_PAGE:
+            next_link = NEXT_PAGE_LINK.format(url=html.escape(
+                RESULTS_PATH + '?' + urlencode(dict(query, page=page + 1))
+            ))
+
+        return RESULTS_PAGE.format(rows=rows, next_link=next_link)
+
+    def _details_page(self, query):
+        try:
+            northgate_id = int(query['PARAM0'])
+        except (KeyError, ValueError):
+            northgate_id = None
+
+        if northgate_id is None or not self.applications.exists(northgate_id):
+            self._send(404, 'Not Found')
+        else:
+            self._send(200, self.applications.page(northgate_id))
+
+    def _send(self, status, body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        LOG.debug(format, *args)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def make_server(applications, latency=0.0, error_rate=0.0, port=0):
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'applications': applications,
+        'latency': latency,
+        'error_rate': error_rate,
+    })
+    return ThreadingHTTPServer(('127.0.0.1', port), handler)
+
+
+def start_in_thread(applications, latency=0.0, error_rate=0.0):
+    """
+    Start a stub server on a free port in a background thread. Returns the
+    server (call .shutdown() when done) and the search page URL.
+    """
+    server = make_server(applications, latency, error_rate)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, search_url(server.server_port)
+
+
+def start_in_process(count, days=30, latency=0.0, error_rate=0.0):
+    """
+    As start_in_thread, but in a separate process so the server doesn't
+    count towards the caller's memory and CPU. Returns the process (call
+    .terminate() when done) and the search page URL.
+    """
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve, args=(ports, count, days, latency, error_rate))
+    process.daemon = True
+    process.start()
+    return process, search_url(ports.get(timeout=30))
+
+
+def _serve(ports, count, days, latency, error_rate):
+    server = make_server(
+        SyntheticApplications(count, days), latency, error_rate)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def search_url(port):
+    return 'http://127.0.0.1:{}{}'.format(port, SEARCH_PATH)
+
+
+def _details_url(northgate_id):
+    return '{}?{}'.format(DETAILS_PATH, urlencode([
+        ('PT', 'Planning Applications On-Line'),
+        ('TYPE', 'PL/PlanningPK.xml'),
+        ('PARAM0', northgate_id),
+    ]))
+
+
+def _format_date(date):
+    return date.strftime('%d-%m-%Y')
+
+
+def _parse_iso_date(text):
+    try:
+        return datetime.datetime.strptime(text, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def _read(filename):
+    with io.open(filename, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+SEARCH_FORM = '''<!DOCTYPE html>
+<html><head><title>General Search</title></head><body>
+<form method="get" action="Generic/StdResults.aspx">
+  <select id="cboSelectDateValue" name="cboSelectDateValue">
+    <option>Date Received</option>
+    <option>Date Decided</option>
+  </select>
+  <input type="radio" id="rbDay" name="dateType" value="DAYS" />
+  <input type="radio" id="rbRange" name="dateType" value="RANGE" />
+  <select id="cboDays" name="cboDays"><option>7</option><option>30</option>
+  </select>
+  <input type="text" id="dateStart" name="dateStart" />
+  <input type="text" id="dateEnd" name="dateEnd" />
+  <input type="submit" id="csbtnSearch" value="Search" />
+</form>
+</body></html>
+'''
+
+RESULTS_PAGE = '''<!DOCTYPE html>
+<html><head><title>Search Results</title></head><body>
+<table summary="Results of the Search">
+{rows}
+</table>
+{next_link}
+</body></html>
+'''
+
+RESULT_ROW = '''<tr><td title="View Application Details"><a href="{url}">{number}</a></td></tr>
+'''  # noqa
+
+NEXT_PAGE_LINK = '<a href="{url}"><img alt="Go to next page" src="" /></a>'
+
+NO_RESULTS = '''<!DOCTYPE html>
+<html><head><title>Search Results</title></head><body>
+<span>No Records Found</span>
+</body></html>
+'''
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    args = _parse_args(argv)
+
+    server = make_server(
+        SyntheticApplications(args.applications, args.days),
+        latency=args.latency, error_rate=args.error_rate, port=args.port
+    )
+    LOG.info('Serving {} applications at {}'.format(
+        args.applications, search_url(server.server_port)))
+    server.serve_forever()
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Serve a fake Northgate Planning Explorer.')
+    parser.add_argument('--port', type=int, default=8017)
+    parser.add_argument('--applications', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30,
+                        help='spread applications over this many days')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='mean seconds to wait before each response')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests answered with a 503')
+    return parser.parse_args(argv[1:])
+
+
+if __name__ == '__main__':
+    main(sys.argv)
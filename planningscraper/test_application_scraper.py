@@ -1,12 +1,16 @@
 import datetime
 import glob
 import io
+import pickle
 
 from collections import OrderedDict
 from os.path import basename, dirname, join as pjoin
 
 from nose.tools import assert_equal, assert_almost_equal
-from application_scraper import parse_application_page
+from application_scraper import (
+    parse_application_page, parse_application_fields,
+    iterparse_application_fields, normalise_postcode, Application
+)
 
 assert_equal.__self__.maxDiff = None
 
@@ -105,7 +109,7 @@ def test_parse_application_pages():
 
 def _test_parse_application_page(filename):
     with io.open(pjoin(SAMPLE_DIR, filename), 'rb') as f:
-        parsed = parse_application_page(f.read())
+        parsed = parse_application_page(f.read()).as_dict()
         parsed.pop('extract_datetime')  # TODO: refactor
 
     expected = EXPECTED[filename]
@@ -116,3 +120,40 @@ def _test_parse_application_page(filename):
             assert_almost_equal(expected_value, parsed[key], 5, key)
         else:
             assert_equal(expected_value, parsed[key], key)
+
+
+def test_iterparse_matches_parse():
+    for filename in glob.glob(SAMPLE_DIR + '/*.html'):
+        yield _test_iterparse_matches_parse, basename(filename)
+
+
+def _test_iterparse_matches_parse(filename):
+    with io.open(pjoin(SAMPLE_DIR, filename), 'rb') as f:
+        page_bytes = f.read()
+
+    assert_equal(
+        parse_application_fields(page_bytes),
+        iterparse_application_fields(io.BytesIO(page_bytes), chunk_size=512)
+    )
+
+
+def test_application_to_row():
+    application = Application(application_number='16F/2687', wards='Woolton')
+    row = application.to_row(northgate_id=1019820)
+
+    assert_equal(1019820, row['northgate_id'])
+    assert_equal('Woolton', row['wards'])
+    assert_equal(None, row['decision'])
+    assert_equal(len(Application.__slots__) + 1, len(row))
+
+
+def test_application_survives_pickling():
+    application = Application(application_number='16F/2687')
+    assert_equal(application, pickle.loads(pickle.dumps(application)))
+
+
+def test_normalise_postcode():
+    assert_equal('L15 3JL', normalise_postcode('l15 3jl'))
+    assert_equal('L15 3JL', normalise_postcode('L153JL'))
+    assert_equal('L1 3JL', normalise_postcode('L13JL'))
+    assert_equal(None, normalise_postcode('Smithdown Road'))
@@ -0,0 +1,170 @@
+import datetime
+
+import dataset
+
+from nose.tools import assert_equal, assert_raises, assert_true, assert_false
+from planningscraper.checkpoints import RefreshQueue, DiscoveryCheckpoint
+from planningscraper.db import use_database
+from recent_applications_scraper import RecentApplicationsScraper
+
+
+RUN_DATE = datetime.date(2016, 11, 20)
+YESTERDAY = datetime.date(2016, 11, 19)
+DAY_BEFORE = datetime.date(2016, 11, 18)
+
+
+def _rows(*northgate_ids):
+    return [
+        {'northgate_id': northgate_id, 'url': 'http://example.com/{}'.format(
+            northgate_id)}
+        for northgate_id in northgate_ids
+    ]
+
+
+def test_refresh_queue_remaining_keeps_order():
+    use_database(dataset.connect('sqlite://'))
+
+    queue = RefreshQueue(RUN_DATE)
+    queue.save(_rows(3, 1, 2))
+
+    assert_equal(_rows(3, 1, 2), queue.remaining())
+
+
+def test_refresh_queue_mark_done():
+    use_database(dataset.connect('sqlite://'))
+
+    queue = RefreshQueue(RUN_DATE)
+    queue.save(_rows(3, 1, 2))
+
+    queue.mark_done(1)
+
+    assert_equal(_rows(3, 2), RefreshQueue(RUN_DATE).remaining())
+
+
+def test_refresh_queue_save_replaces_finished_queue():
+    use_database(dataset.connect('sqlite://'))
+
+    queue = RefreshQueue(RUN_DATE)
+    queue.save(_rows(1))
+    queue.mark_done(1)
+    assert_equal([], queue.remaining())
+
+    queue.save(_rows(2))
+
+    assert_equal(_rows(2), queue.remaining())
+
+
+def test_refresh_queue_from_another_day_is_discarded():
+    use_database(dataset.connect('sqlite://'))
+
+    RefreshQueue(DAY_BEFORE).save(_rows(1, 2))
+    RefreshQueue(RUN_DATE).save(_rows(3))
+
+    assert_equal([], RefreshQueue(DAY_BEFORE).remaining())
+
+
+class FakeLink():
+    def __init__(self, northgate_id):
+        self.northgate_id = northgate_id
+
+    def get_attribute(self, name):
+        return 'http://example.com/StdDetails.aspx?PARAM0={}'.format(
+            self.northgate_id)
+
+
+class FakeSearch(RecentApplicationsScraper):
+    """
+    Serves `results` (received date -> list of results pages, each a list
+    of northgate ids) in place of the council's search form, optionally
+    crashing when asked for the (date, page index) `crash_on`.
+    """
+
+    def __init__(self, results, crash_on=None):
+        super(FakeSearch, self).__init__(webdriver=self)
+        self.results = results
+        self.crash_on = crash_on
+        self.pages_loaded = []
+
+    def _last_30_days(self):
+        return sorted(self.results, reverse=True)
+
+    def _navigate_to_advanced_search_page(self):
+        pass
+
+    def _search_by_date_received_equal_to(self, date):
+        self._load(date, 0)
+
+    def _wait_for_results_page(self):
+        pass
+
+    def _go_to_next_page(self):
+        if self.page + 1 >= len(self.results[self.date]):
+            return False
+        self._load(self.date, self.page + 1)
+        return True
+
+    def _load(self, date, page):
+        if (date, page) == self.crash_on:
+            raise RuntimeError('Browser crashed')
+        self.date, self.page = date, page
+        self.pages_loaded.append((date, page))
+
+    def find_elements(self, by, value):
+        return [
+            FakeLink(northgate_id)
+            for northgate_id in self.results[self.date][self.page]
+        ]
+
+
+RESULTS = {
+    YESTERDAY: [[1, 2], [3]],
+    DAY_BEFORE: [[4, 5], [6, 7], [8]],
+}
+
+
+def _northgate_ids(applications):
+    return [int(application['northgate_id']) for application in applications]
+
+
+def test_get_applications_without_checkpoint_yields_everything():
+    search = FakeSearch(RESULTS)
+
+    assert_equal(
+        [1, 2, 3, 4, 5, 6, 7, 8],
+        _northgate_ids(search.get_applications())
+    )
+
+
+def test_get_applications_resumes_after_crash():
+    use_database(dataset.connect('sqlite://'))
+
+    checkpoint = DiscoveryCheckpoint(RUN_DATE)
+    found = []
+
+    crashing = FakeSearch(RESULTS, crash_on=(DAY_BEFORE, 2))
+    with assert_raises(RuntimeError):
+        for application in crashing.get_applications(checkpoint):
+            found.append(application)
+
+    assert_equal([1, 2, 3, 4, 5, 6, 7], _northgate_ids(found))
+    assert_true(checkpoint.unfinished([YESTERDAY, DAY_BEFORE]))
+
+    resumed = FakeSearch(RESULTS)
+    found = list(resumed.get_applications(DiscoveryCheckpoint(RUN_DATE)))
+
+    # Yesterday isn't searched again, and the two pages of the day before
+    # that were already saved are clicked past but not yielded again.
+    assert_equal([8], _northgate_ids(found))
+    assert_equal(
+        [(DAY_BEFORE, 0), (DAY_BEFORE, 1), (DAY_BEFORE, 2)],
+        resumed.pages_loaded
+    )
+    assert_false(checkpoint.unfinished([YESTERDAY, DAY_BEFORE]))
+
+
+def test_discovery_not_started_is_not_unfinished():
+    use_database(dataset.connect('sqlite://'))
+
+    checkpoint = DiscoveryCheckpoint(datetime.date(2016, 11, 21))
+
+    assert_false(checkpoint.unfinished([YESTERDAY, DAY_BEFORE]))
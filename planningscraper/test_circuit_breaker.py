@@ -0,0 +1,200 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+from datetime import timedelta
+from os.path import dirname, join as pjoin
+
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import requests
+import requests_cache
+
+from nose.tools import assert_equal, assert_raises, assert_greater
+from circuit_breaker import (
+    CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN, backoff_delay
+)
+from application_scraper import scrape_single_application
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _make_breaker(**kwargs):
+    clock = FakeClock()
+    return CircuitBreaker('example.com', clock=clock, **kwargs), clock
+
+
+def test_opens_after_consecutive_failures():
+    breaker, _ = _make_breaker(consecutive_failures=3)
+
+    for _ in range(3):
+        breaker.before_request()
+        breaker.record_failure()
+
+    assert_equal(OPEN, breaker.state)
+    assert_raises(CircuitOpenError, breaker.before_request)
+
+
+def test_opens_when_error_budget_spent():
+    breaker, _ = _make_breaker(
+        window=10, error_budget=0.2, consecutive_failures=100)
+
+    for i in range(10):
+        breaker.before_request()
+        if i % 3 == 0:
+            breaker.record_failure()
+        else:
+            breaker.record_success(0.1)
+
+    assert_equal(OPEN, breaker.state)
+
+
+def test_half_open_trial_success_closes_circuit():
+    breaker, clock = _make_breaker(consecutive_failures=1, reset_timeout=60)
+
+    breaker.before_request()
+    breaker.record_failure()
+    clock.now += 61
+
+    breaker.before_request()
+    assert_equal(HALF_OPEN, breaker.state)
+    assert_raises(CircuitOpenError, breaker.before_request)  # one trial only
+
+    breaker.record_success(0.1)
+    assert_equal(CLOSED, breaker.state)
+    assert_equal(1, breaker.metrics['to_closed'])
+
+
+def test_half_open_trial_failure_reopens_circuit():
+    breaker, clock = _make_breaker(consecutive_failures=1, reset_timeout=60)
+
+    breaker.before_request()
+    breaker.record_failure()
+    clock.now += 61
+
+    breaker.before_request()
+    breaker.record_failure()
+
+    assert_equal(OPEN, breaker.state)
+    assert_equal(60, breaker.retry_after())
+
+
+def test_slow_responses_are_throttled():
+    breaker, _ = _make_breaker(target_latency=1.0)
+    assert_equal(0, breaker.throttle_delay())
+
+    for _ in range(10):
+        breaker.record_success(5.0)
+
+    assert_greater(breaker.throttle_delay(), 0)
+
+
+def test_backoff_delay_is_capped():
+    assert_equal([5, 10, 20], [backoff_delay(n) for n in (1, 2, 3)])
+    assert_equal(300, backoff_delay(20))
+
+
+SAMPLE_PAGE = pjoin(dirname(__file__), 'sample_data', 'application_pages',
+                    '001.html')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    status = 503
+    requests_served = 0
+
+    def do_GET(self):
+        StubHandler.requests_served += 1
+        self.send_response(StubHandler.status)
+        self.end_headers()
+        if StubHandler.status == 200:
+            with io.open(SAMPLE_PAGE, 'rb') as f:
+                self.wfile.write(f.read())
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer():
+    """
+    Serves `StubHandler` in a scratch working directory, where
+    requests_cache writes its cache.db.
+    """
+
+    def __enter__(self):
+        StubHandler.status = 503
+        StubHandler.requests_served = 0
+
+        self.server = HTTPServer(('127.0.0.1', 0), StubHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.url = 'http://127.0.0.1:{}/StdDetails.aspx'.format(
+            self.server.server_port)
+
+        self.original_directory = os.getcwd()
+        self.scratch = tempfile.mkdtemp()
+        os.chdir(self.scratch)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.original_directory)
+        shutil.rmtree(self.scratch)
+
+
+def _assert_breaker_opens(url, breaker):
+    for _ in range(3):
+        assert_raises(
+            requests.HTTPError, scrape_single_application, url, breaker)
+
+    assert_raises(CircuitOpenError, scrape_single_application, url, breaker)
+    assert_equal(OPEN, breaker.state)
+
+
+def test_scraper_stops_calling_failing_server():
+    with StubServer() as stub:
+        _assert_breaker_opens(
+            stub.url, CircuitBreaker('stub', consecutive_failures=3))
+
+        assert_equal(3, StubHandler.requests_served)
+
+
+def test_expired_cached_copy_doesnt_bypass_breaker():
+    with StubServer() as stub:
+        StubHandler.status = 200
+        scrape_single_application(stub.url)
+
+        with requests_cache.enabled('cache.db'):
+            responses = requests_cache.get_cache().responses
+            for key in list(responses):
+                response, saved_at = responses[key]
+                responses[key] = response, saved_at - timedelta(days=1)
+
+        StubHandler.status = 503
+        _assert_breaker_opens(
+            stub.url, CircuitBreaker('stub', consecutive_failures=3))
+
+        assert_equal(4, StubHandler.requests_served)
+
+
+def test_fresh_cached_copy_isnt_recorded():
+    with StubServer() as stub:
+        StubHandler.status = 200
+        breaker = CircuitBreaker('stub')
+
+        scrape_single_application(stub.url, breaker)
+        scrape_single_application(stub.url, breaker)
+
+        assert_equal(1, StubHandler.requests_served)
+        assert_equal(1, breaker.metrics['successes'])
+        assert_equal(1, breaker.metrics['cached'])
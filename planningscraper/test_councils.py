@@ -0,0 +1,215 @@
+import datetime
+import io
+import shutil
+import tempfile
+
+from os.path import join as pjoin
+
+import dataset
+import requests
+import sqlalchemy.exc
+
+from nose.tools import assert_equal, assert_raises
+from planningscraper import councils
+from planningscraper.circuit_breaker import CircuitOpenError
+from planningscraper.councils import Council, RateLimiter, load_councils
+from planningscraper.db import create_council_tables
+
+
+def test_load_councils_applies_defaults():
+    directory = tempfile.mkdtemp()
+    filename = pjoin(directory, 'councils.yml')
+
+    with io.open(filename, 'w') as f:
+        f.write(
+            'councils:\n'
+            '  - name: liverpool\n'
+            '    search_url: http://liverpool.example.com/\n'
+            '    requests_per_second: 0.5\n'
+            '    fetch_budget: 3000\n'
+            '  - name: wirral\n'
+            '    search_url: http://wirral.example.com/\n'
+        )
+
+    try:
+        assert_equal(
+            [
+                Council('liverpool', 'http://liverpool.example.com/', 0.5,
+                        3000),
+                Council('wirral', 'http://wirral.example.com/', 1.0, None),
+            ],
+            load_councils(filename)
+        )
+    finally:
+        shutil.rmtree(directory)
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_rate_limiter_spaces_out_calls():
+    clock = FakeClock()
+    limiter = RateLimiter(2, clock=clock, sleep=clock.sleep)
+
+    limiter.wait()
+    limiter.wait()
+    clock.now += 0.2
+    limiter.wait()
+
+    assert_equal([0.5, 0.3], [round(delay, 3) for delay in clock.slept])
+
+
+def test_rate_limiter_doesnt_save_up_idle_time():
+    clock = FakeClock()
+    limiter = RateLimiter(1, clock=clock, sleep=clock.sleep)
+
+    limiter.wait()
+    clock.now += 60
+    limiter.wait()
+    limiter.wait()
+
+    assert_equal([1.0], clock.slept)
+
+
+class FakeApplication():
+    def to_row(self, **fields):
+        row = {
+            'extract_datetime': datetime.datetime.now(),
+            'description': 'To erect a porch',
+        }
+        row.update(fields)
+        return row
+
+
+class FakeScraper():
+    """
+    Stands in for `scrape_single_application`, raising `errors[url]` for
+    any URL listed there.
+    """
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.urls = []
+        self.cache_names = set()
+
+    def __call__(self, url, breaker=None, cache_name='cache.db'):
+        self.urls.append(url)
+        self.cache_names.add(cache_name)
+        if url in self.errors:
+            raise self.errors[url]
+        return FakeApplication()
+
+
+def _make_table():
+    db = dataset.connect('sqlite://')
+    table = create_council_tables(db)
+
+    recently = datetime.date.today() - datetime.timedelta(days=10)
+    for council, northgate_id, extract_datetime in [
+            ('liverpool', 1, None),
+            ('liverpool', 2, None),
+            ('liverpool', 3, datetime.datetime.now()),  # not due
+            ('wirral', 1, None),
+            ]:
+        table.insert({
+            'council': council,
+            'northgate_id': northgate_id,
+            'url': 'http://{}/{}'.format(council, northgate_id),
+            'received_date': recently,
+            'extract_datetime': extract_datetime,
+        })
+
+    return db, table
+
+
+def _refresh(scraper, fetch_budget=None):
+    db, table = _make_table()
+    council = Council('liverpool', 'http://liverpool/', 1000, fetch_budget)
+
+    original = councils.scrape_single_application
+    councils.scrape_single_application = scraper
+    try:
+        refreshed = councils.refresh_applications(council, db, table)
+    finally:
+        councils.scrape_single_application = original
+
+    return refreshed, table
+
+
+def test_refresh_only_fetches_due_applications_for_council():
+    scraper = FakeScraper()
+
+    refreshed, table = _refresh(scraper)
+
+    assert_equal(2, refreshed)
+    assert_equal(
+        ['http://liverpool/1', 'http://liverpool/2'], sorted(scraper.urls))
+    assert_equal(
+        None,
+        table.find_one(council='wirral', northgate_id=1)['extract_datetime']
+    )
+    assert_equal(
+        'To erect a porch',
+        table.find_one(council='liverpool', northgate_id=1)['description']
+    )
+    assert_equal(4, table.count())
+
+
+def test_refresh_uses_council_response_cache():
+    scraper = FakeScraper()
+
+    _refresh(scraper)
+
+    assert_equal({'cache-liverpool.db'}, scraper.cache_names)
+
+
+def test_refresh_respects_fetch_budget():
+    scraper = FakeScraper()
+
+    refreshed, _ = _refresh(scraper, fetch_budget=1)
+
+    assert_equal(1, refreshed)
+    assert_equal(1, len(scraper.urls))
+
+
+def test_refresh_skips_failed_fetches():
+    scraper = FakeScraper(errors={
+        'http://liverpool/1': requests.ConnectionError('refused'),
+    })
+
+    refreshed, _ = _refresh(scraper)
+
+    assert_equal(1, refreshed)
+    assert_equal(2, len(scraper.urls))
+
+
+def test_refresh_stops_when_circuit_opens():
+    error = CircuitOpenError('liverpool', 60)
+    scraper = FakeScraper(errors={
+        'http://liverpool/1': error,
+        'http://liverpool/2': error,
+    })
+
+    refreshed, _ = _refresh(scraper)
+
+    assert_equal(0, refreshed)
+    assert_equal(1, len(scraper.urls))
+
+
+def test_council_and_northgate_id_are_unique():
+    _, table = _make_table()
+
+    assert_raises(
+        sqlalchemy.exc.IntegrityError,
+        table.insert, {'council': 'liverpool', 'northgate_id': 1}
+    )
@@ -0,0 +1,200 @@
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from os.path import exists, join as pjoin
+
+import dataset
+
+from nose.tools import assert_equal, assert_false
+from planningscraper import output
+from planningscraper.db import applications_table, use_database
+from planningscraper.output import (
+    month_range, months_to_check, hash_rows, output_data,
+    output_by_received_month
+)
+
+
+SCRAPED = datetime.datetime(2016, 12, 10, 5, 30)
+
+
+def test_month_range():
+    def _check(month, expected):
+        assert_equal(expected, month_range(month))
+
+    for month, expected in [
+            ('2016-11', {'start': '2016-11-01', 'end': '2016-12-01'}),
+            ('2016-12', {'start': '2016-12-01', 'end': '2017-01-01'}),
+            ]:
+        yield _check, month, expected
+
+
+def test_hash_rows_ignores_scrape_only_columns():
+    row = {'northgate_id': 1, 'decision': None,
+           'extract_datetime': '2016-12-10 05:30:00'}
+
+    rescraped = dict(row, extract_datetime='2016-12-17 05:30:00')
+    decided = dict(row, decision='Approved')
+
+    assert_equal(hash_rows([row]), hash_rows([rescraped]))
+    assert_equal(1, hash_rows([decided])[0])
+    assert_false(hash_rows([row]) == hash_rows([decided]))
+
+
+class ScratchExport():
+    """
+    An export directory and a scratch database holding applications
+    received in October, November and December 2016, with `write_month`
+    calls recorded.
+    """
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp()
+        self.months_written = []
+
+        self._write_month = output.write_month
+        output.write_month = self._record_write_month
+
+        use_database(dataset.connect('sqlite://'))
+        applications = applications_table()
+        for northgate_id, received_date in [
+                (1, datetime.date(2016, 10, 3)),
+                (2, datetime.date(2016, 11, 20)),
+                (3, datetime.date(2016, 11, 30)),
+                (4, datetime.date(2016, 12, 1)),
+                ]:
+            applications.insert({
+                'northgate_id': northgate_id,
+                'received_date': received_date,
+                'extract_datetime': SCRAPED + datetime.timedelta(
+                    minutes=northgate_id),
+                'decision': None,
+            })
+
+        return self
+
+    def __exit__(self, *exc_info):
+        output.write_month = self._write_month
+        shutil.rmtree(self.directory)
+
+    def _record_write_month(self, directory, month):
+        self.months_written.append(month)
+        self._write_month(directory, month)
+
+    def export(self):
+        self.months_written = []
+        output_by_received_month(self.directory)
+        return self.months_written
+
+    def index(self):
+        filename = pjoin(self.directory, output.BY_MONTH_INDEX_FILENAME)
+        with io.open(filename) as f:
+            return json.load(f)
+
+
+def _rescrape(northgate_id, **changes):
+    changes['extract_datetime'] = SCRAPED + datetime.timedelta(days=7)
+    changes['northgate_id'] = northgate_id
+    applications_table().update(changes, ['northgate_id'])
+
+
+def test_months_to_check_since_last_export():
+    with ScratchExport() as export:
+        assert_equal(
+            ['2016-10', '2016-11', '2016-12'],
+            months_to_check(export.directory, None, {})
+        )
+
+        export.export()
+        index = export.index()
+        _rescrape(2)
+
+        # December holds the latest scrape seen by the last export, which
+        # is looked at again in case others were saved in the same instant.
+        assert_equal(
+            ['2016-11', '2016-12'],
+            months_to_check(export.directory, index['high_water_mark'], {})
+        )
+
+
+def test_months_to_check_includes_missing_shards():
+    with ScratchExport() as export:
+        export.export()
+        index = export.index()
+        os.remove(output.month_filename(export.directory, '2016-10', 'csv'))
+
+        assert_equal(
+            ['2016-10', '2016-12'],
+            months_to_check(
+                export.directory, index['high_water_mark'],
+                {shard['month']: shard for shard in index['shards']}
+            )
+        )
+
+
+def test_first_export_writes_every_month():
+    with ScratchExport() as export:
+        assert_equal(['2016-10', '2016-11', '2016-12'], export.export())
+        assert_equal(
+            [('2016-10', 1), ('2016-11', 2), ('2016-12', 1)],
+            [(shard['month'], shard['rows'])
+             for shard in export.index()['shards']]
+        )
+
+
+def test_rescrape_without_changes_rewrites_nothing():
+    with ScratchExport() as export:
+        export.export()
+        _rescrape(2)
+
+        assert_equal([], export.export())
+
+
+def test_changed_row_rewrites_only_its_month():
+    with ScratchExport() as export:
+        export.export()
+        _rescrape(2, decision='Approved')
+        _rescrape(4)
+
+        assert_equal(['2016-11'], export.export())
+
+        with io.open(output.month_filename(
+                export.directory, '2016-11', 'json')) as f:
+            assert 'Approved' in f.read()
+
+
+def test_month_files_leave_out_scrape_only_columns():
+    with ScratchExport() as export:
+        export.export()
+
+        with io.open(output.month_filename(
+                export.directory, '2016-11', 'csv')) as f:
+            header = f.readline()
+        with io.open(output.month_filename(
+                export.directory, '2016-11', 'json')) as f:
+            rows = json.load(f)['results']
+
+        assert 'northgate_id' in header
+        assert 'extract_datetime' not in header
+        assert_equal([2, 3], [row['northgate_id'] for row in rows])
+        assert_false(any('extract_datetime' in row for row in rows))
+
+
+def test_output_data_removes_year_to_date():
+    with ScratchExport() as export:
+        os.makedirs(pjoin(export.directory, 'applications'))
+        for fmt in ['csv', 'json']:
+            filename = pjoin(export.directory, 'applications',
+                             'year_to_date.{}'.format(fmt))
+            with io.open(filename, 'w') as f:
+                f.write(u'stale')
+
+        output_data(export.directory)
+
+        assert_false(exists(pjoin(
+            export.directory, 'applications', 'year_to_date.csv')))
+        assert_false(exists(pjoin(
+            export.directory, 'applications', 'year_to_date.json')))
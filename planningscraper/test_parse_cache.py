@@ -0,0 +1,97 @@
+import io
+import shutil
+import tempfile
+
+from os.path import dirname, join as pjoin
+
+from nose.tools import assert_equal
+from parse_cache import ParseCache
+from application_scraper import parse_application_fields
+
+
+SAMPLE_PAGE = pjoin(dirname(__file__), 'sample_data', 'application_pages',
+                    '002_comments_closed.html')
+
+
+class CountingParser():
+    def __init__(self, parse=parse_application_fields):
+        self.parse = parse
+        self.calls = 0
+
+    def __call__(self, page_bytes):
+        self.calls += 1
+        return self.parse(page_bytes)
+
+
+def _with_cache(test):
+    def wrapper():
+        directory = tempfile.mkdtemp()
+        cache = ParseCache(pjoin(directory, 'parse_cache.db'))
+        try:
+            test(cache)
+        finally:
+            cache.close()
+            shutil.rmtree(directory)
+    wrapper.__name__ = test.__name__
+    return wrapper
+
+
+def _sample_page():
+    with io.open(SAMPLE_PAGE, 'rb') as f:
+        return f.read()
+
+
+@_with_cache
+def test_identical_page_is_parsed_once(cache):
+    parse = CountingParser()
+    page = _sample_page()
+
+    first = cache.get_or_parse(page, parse, 'v1')
+    second = cache.get_or_parse(page, parse, 'v1')
+
+    assert_equal(1, parse.calls)
+    assert_equal(first, second)
+    assert_equal((1, 1), (cache.hits, cache.misses))
+
+
+@_with_cache
+def test_new_parser_version_reparses(cache):
+    parse = CountingParser()
+    page = _sample_page()
+
+    cache.get_or_parse(page, parse, 'v1')
+    cache.get_or_parse(page, parse, 'v2')
+
+    assert_equal(2, parse.calls)
+
+
+@_with_cache
+def test_prune_bounds_size(cache):
+    cache.max_entries = 2
+
+    for page in [b'a', b'b', b'c']:
+        cache.get_or_parse(page, len, 'v1')
+
+    cache.prune()
+
+    assert_equal(
+        2,
+        cache.connection.execute(
+            'SELECT COUNT(*) FROM parsed_pages').fetchone()[0]
+    )
+
+
+@_with_cache
+def test_hits_keep_entries_from_being_pruned(cache):
+    parse = CountingParser(len)
+    cache.max_entries = 2
+
+    cache.get_or_parse(b'a', parse, 'v1')
+    cache.get_or_parse(b'b', parse, 'v1')
+    cache.get_or_parse(b'a', parse, 'v1')  # hit: 'b' is now least recent
+    cache.get_or_parse(b'c', parse, 'v1')
+
+    cache.prune()
+    cache.get_or_parse(b'a', parse, 'v1')
+
+    assert_equal(3, parse.calls)
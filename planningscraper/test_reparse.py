@@ -0,0 +1,28 @@
+import glob
+import io
+
+from os.path import dirname, join as pjoin
+
+from nose.tools import assert_equal
+from planningscraper.reparse import reparse_files
+from application_scraper import parse_application_fields
+
+
+SAMPLE_PAGES = sorted(glob.glob(
+    pjoin(dirname(__file__), 'sample_data', 'application_pages', '*.html')))
+
+
+def _parse(filename):
+    with io.open(filename, 'rb') as f:
+        return parse_application_fields(f.read()).as_dict()
+
+
+def test_reparse_files_matches_parse():
+    expected = [(filename, _parse(filename)) for filename in SAMPLE_PAGES]
+
+    for workers in [1, 2]:
+        assert_equal(
+            expected,
+            [(filename, application.as_dict()) for filename, application
+             in reparse_files(SAMPLE_PAGES, workers=workers)]
+        )
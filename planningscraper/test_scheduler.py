@@ -0,0 +1,67 @@
+import datetime
+
+from nose.tools import assert_equal, assert_greater
+from scheduler import prioritise, score_application, NEVER_SCRAPED_SCORE
+
+
+TODAY = datetime.date(2016, 11, 20)
+
+
+def _row(**kwargs):
+    row = {
+        'northgate_id': 1,
+        'extract_datetime': '2016-11-13 05:30:00.000000',
+        'comments_until_date': None,
+        'committee_date': None,
+        'decision': 'Approved',
+        'current_status': 'DECIDED',
+    }
+    row.update(kwargs)
+    return row
+
+
+def test_never_scraped_comes_first():
+    assert_equal(
+        NEVER_SCRAPED_SCORE,
+        score_application(_row(extract_datetime=None), TODAY)
+    )
+
+
+def test_committee_tomorrow_beats_idle_application():
+    idle = _row()
+    committee_tomorrow = _row(
+        committee_date=datetime.date(2016, 11, 21),
+        decision=None,
+        current_status='REGISTERED',
+    )
+
+    assert_greater(
+        score_application(committee_tomorrow, TODAY),
+        score_application(idle, TODAY)
+    )
+
+
+def test_open_for_comments_beats_decided():
+    decided = _row()
+    open_for_comments = _row(
+        comments_until_date='2016-11-28',
+        decision=None,
+        current_status='REGISTERED',
+    )
+
+    assert_greater(
+        score_application(open_for_comments, TODAY),
+        score_application(decided, TODAY)
+    )
+
+
+def test_prioritise_applies_budget_in_score_order():
+    rows = [
+        _row(northgate_id=1),
+        _row(northgate_id=2, extract_datetime=None),
+        _row(northgate_id=3, committee_date='2016-11-21', decision=None),
+    ]
+
+    ordered = prioritise(rows, budget=2, today=TODAY)
+
+    assert_equal([2, 3], [row['northgate_id'] for row in ordered])
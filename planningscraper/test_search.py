@@ -0,0 +1,124 @@
+import dataset
+
+from nose.tools import assert_equal
+from planningscraper.db import applications_table, use_database
+from planningscraper.search import (
+    rebuild_index, index_application, search, match_expression,
+    postcode_like_pattern
+)
+
+
+APPLICATIONS = [
+    {
+        'northgate_id': 1,
+        'description': 'Change of use from shop to micro brewery',
+        'site_address': '12 Lark Lane, LIVERPOOL, L17 8UU',
+        'postcode': 'L17 8UU',
+        'applicant': 'Mr A Smith',
+        'agent': None,
+    },
+    {
+        'northgate_id': 2,
+        'description': 'To install new shopfront',
+        'site_address': '3 Bold Street, LIVERPOOL, L1 4DJ',
+        'postcode': 'L1 4DJ',
+        'applicant': 'Lark Lane Brewery Ltd',
+        'agent': None,
+    },
+    {
+        'northgate_id': 3,
+        'description': 'To erect single storey rear extension',
+        'site_address': '461 Smithdown Road, LIVERPOOL, L15 3JL',
+        'postcode': 'L15 3JL',
+        'applicant': 'Ms B Jones',
+        'agent': 'Acme Architects',
+    },
+    {
+        'northgate_id': 4,
+        'description': 'To erect two storey side extension',
+        'site_address': '1 Hope Street, LIVERPOOL, L1 9BQ',
+        'postcode': 'L1 9BQ',
+        'applicant': 'Mr C Brown',
+        'agent': None,
+    },
+]
+
+
+def _load_applications():
+    use_database(dataset.connect('sqlite://'))
+    applications = applications_table()
+    for row in APPLICATIONS:
+        applications.insert(row)
+    rebuild_index()
+
+
+def _ids(rows):
+    return [row['northgate_id'] for row in rows]
+
+
+def test_match_expression():
+    def _check(query, expected):
+        assert_equal(expected, match_expression(query))
+
+    for query, expected in [
+            ('brewery', '"brewery"'),
+            ('nano brew*', '"nano" "brew"*'),
+            ('"quoted" OR NOT', '"""quoted""" "OR" "NOT"'),
+            ('', ''),
+            ('  *  ** ', ''),
+            ]:
+        yield _check, query, expected
+
+
+def test_postcode_like_pattern():
+    def _check(postcode, expected):
+        assert_equal(expected, postcode_like_pattern(postcode))
+
+    for postcode, expected in [
+            ('l15 3jl', 'L15 3JL'),
+            ('l15 3', 'L15 3%'),
+            ('L15', 'L15 %'),
+            ('L1', 'L1 %'),
+            ]:
+        yield _check, postcode, expected
+
+
+def test_search_ranks_description_matches_first():
+    _load_applications()
+
+    assert_equal([1, 2], _ids(search('brewery')))
+
+
+def test_search_prefix():
+    _load_applications()
+
+    assert_equal([1, 2], _ids(search('brew*')))
+
+
+def test_search_needs_all_words():
+    _load_applications()
+
+    assert_equal([3], _ids(search('rear extension')))
+
+
+def test_search_outward_postcode_is_not_a_prefix():
+    _load_applications()
+
+    assert_equal([4], _ids(search('extension', postcode='L1')))
+    assert_equal([3], _ids(search('extension', postcode='l15')))
+
+
+def test_search_without_words_finds_nothing():
+    _load_applications()
+
+    assert_equal([], search(''))
+    assert_equal([], search('*'))
+
+
+def test_index_application_replaces_entry():
+    _load_applications()
+
+    index_application(3, dict(APPLICATIONS[2], description='Loft brewery'))
+
+    assert_equal([3], _ids(search('brewery', postcode='L15')))
+    assert_equal([4], _ids(search('extension')))
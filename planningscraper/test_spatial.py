@@ -0,0 +1,114 @@
+import dataset
+
+from nose.tools import assert_equal, assert_almost_equal
+from planningscraper.db import applications_table, execute, use_database
+from planningscraper.spatial import (
+    ensure_index, rebuild_index, index_application, within_bbox,
+    within_radius, nearest, ward_counts
+)
+
+
+APPLICATIONS = [
+    # northgate_id, easting, northing, wards, decision
+    (1, 1000, 1000, 'Allerton', 'Approved'),
+    (2, 1300, 1400, 'Allerton', None),
+    (3, 1450, 1450, 'Woolton', None),
+    (4, 1350, 1350, 'Woolton', None),
+    (5, None, None, 'Picton', None),
+    (6, 5000, 5000, 'Central', None),
+]
+
+
+def _load_applications():
+    use_database(dataset.connect('sqlite://'))
+    applications = applications_table()
+    for northgate_id, easting, northing, wards, decision in APPLICATIONS:
+        applications.insert({
+            'northgate_id': northgate_id,
+            'geo_easting': easting,
+            'geo_northing': northing,
+            'wards': wards,
+            'decision': decision,
+        })
+    rebuild_index()
+
+
+def _ids(rows):
+    return [row['northgate_id'] for row in rows]
+
+
+def test_within_bbox():
+    _load_applications()
+
+    assert_equal(
+        [1, 2, 4],
+        sorted(_ids(within_bbox(900, 900, 1400, 1400)))
+    )
+
+
+def test_within_radius_filters_corners_and_orders_by_distance():
+    _load_applications()
+
+    # 3 is inside the bounding box but 636m away.
+    rows = within_radius(1000, 1000, 500)
+
+    assert_equal([1, 4, 2], _ids(rows))
+    assert_almost_equal(0, rows[0]['distance'])
+    assert_almost_equal(494.97, rows[1]['distance'], places=2)
+    assert_almost_equal(500, rows[2]['distance'])
+
+
+def test_nearest_widens_search_until_enough_found():
+    _load_applications()
+
+    # Only 6 is within the starting radius.
+    assert_equal([6, 3], _ids(nearest(5000, 5000, 2)))
+
+
+def test_nearest_returns_what_there_is():
+    _load_applications()
+
+    assert_equal([1, 4, 2, 3, 6], _ids(nearest(1000, 1000, 10)))
+
+
+def test_index_application_moves_and_removes():
+    _load_applications()
+
+    index_application(6, 1010, 1010)
+    index_application(1, None, None)
+
+    assert_equal([6], _ids(within_bbox(900, 900, 1100, 1100)))
+
+
+def test_ward_counts():
+    _load_applications()
+
+    counts = {row['wards']: row for row in ward_counts()}
+
+    assert_equal(
+        {'Allerton': (2, 1), 'Woolton': (2, 0), 'Picton': (1, 0),
+         'Central': (1, 0)},
+        {ward: (row['applications'], row['decided'])
+         for ward, row in counts.items()}
+    )
+
+
+def test_ward_counts_within_bbox():
+    _load_applications()
+
+    counts = ward_counts(bbox=(900, 900, 1400, 1400))
+
+    assert_equal(
+        [('Allerton', 2, 1), ('Woolton', 1, 0)],
+        [(row['wards'], row['applications'], row['decided'])
+         for row in counts]
+    )
+
+
+def test_ensure_index_fills_missing_index():
+    _load_applications()
+    execute('DROP TABLE applications_rtree')
+
+    ensure_index()
+
+    assert_equal([1, 2, 4], sorted(_ids(within_bbox(900, 900, 1400, 1400))))
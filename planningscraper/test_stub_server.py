@@ -0,0 +1,33 @@
+import datetime
+
+from nose.tools import assert_equal
+from stub_server import SyntheticApplications, FIRST_NORTHGATE_ID
+from application_scraper import parse_application_fields
+
+
+TODAY = datetime.date(2016, 11, 20)
+
+
+def test_pages_use_synthetic_fields():
+    applications = SyntheticApplications(10, days=5, today=TODAY)
+
+    def _check(northgate_id):
+        fields = parse_application_fields(
+            applications.page(northgate_id).encode('utf-8'), 'utf-8')
+        received = applications.received_date(northgate_id)
+
+        assert_equal(
+            applications.application_number(northgate_id),
+            fields['application_number']
+        )
+        assert_equal(
+            received + datetime.timedelta(days=21),
+            fields['comments_until_date']
+        )
+        assert_equal(
+            'Applicant {}'.format(northgate_id), fields['applicant']
+        )
+
+    # One application built from each template.
+    for northgate_id in range(FIRST_NORTHGATE_ID, FIRST_NORTHGATE_ID + 3):
+        yield _check, northgate_id